@@ -0,0 +1,102 @@
+"""
+Attendance sessions: the set of faces one attendance socket matches against.
+A general session uses the process-wide face index. An event session loads
+only the encodings of users registered for the event, plus any walk-ins
+named when it opens, into a small index of its own that lives as long as
+the socket. Matching a 200-person roster instead of every enrolled student
+is faster and, with fewer look-alikes to choose from, more accurate.
+
+With allow_walk_ins, a face that is not on the roster is looked up in the
+process-wide index; a match is added to the session's roster so the next
+frame finds it directly.
+
+Opening a session also seeds the attendance writer's "already marked" set
+for the event and loads the roster's names, so a repeat scan is answered
+without touching the database.
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlmodel import Session, select
+
+from app.ai.face_encodings import load_enrolled_encodings
+from app.ai.face_index import FaceIndex, face_index
+from app.core.config import FACE_MATCH_TOLERANCE
+from app.db.attendance_writer import attendance_writer
+from app.db.models import EventRegistration, User
+
+
+class AttendanceSession:
+    def __init__(self, event_id: Optional[int] = None, roster: Optional[FaceIndex] = None, allow_walk_ins: bool = False):
+        self.event_id = event_id
+        self.roster = roster
+        self.allow_walk_ins = allow_walk_ins
+        self.walk_ins_added = 0
+        self.names: Dict[int, str] = {}
+
+    @classmethod
+    def general(cls, db: Session) -> "AttendanceSession":
+        face_index.sync(db)
+        attendance_writer.seed(db, None)
+        return cls()
+
+    @classmethod
+    def for_event(
+        cls,
+        db: Session,
+        event_id: int,
+        walk_in_ids: Sequence[int] = (),
+        allow_walk_ins: bool = False,
+    ) -> "AttendanceSession":
+        registered = select(EventRegistration.user_id).where(EventRegistration.event_id == event_id)
+        roster = FaceIndex(partition_threshold=float("inf"))
+        roster.build(*load_enrolled_encodings(db, registered))
+        if walk_in_ids:
+            extra_ids, extra_matrix = load_enrolled_encodings(db, list(walk_in_ids))
+            for user_id, encoding in zip(extra_ids.tolist(), extra_matrix):
+                # Replaces the entry of a walk-in who is also registered
+                roster.add(user_id, encoding)
+        if allow_walk_ins:
+            face_index.sync(db)
+        attendance_writer.seed(db, event_id)
+
+        session = cls(event_id=event_id, roster=roster, allow_walk_ins=allow_walk_ins)
+        on_roster = User.id.in_(registered)
+        if walk_in_ids:
+            on_roster = on_roster | User.id.in_(list(walk_in_ids))
+        session.names = dict(db.exec(select(User.id, User.full_name).where(on_roster)).all())
+        return session
+
+    def name(self, db: Session, user_id: int) -> Optional[str]:
+        """A recognised user's name, read once per session; None if the user no longer exists"""
+        name = self.names.get(user_id)
+        if name is None:
+            name = db.exec(select(User.full_name).where(User.id == user_id)).first()
+            if name is not None:
+                self.names[user_id] = name
+        return name
+
+    @property
+    def size(self) -> int:
+        return self.roster.size if self.roster is not None else face_index.size
+
+    def match(
+        self, db: Session, encodings: Sequence[Sequence[float]], tolerance: float = FACE_MATCH_TOLERANCE
+    ) -> Optional[Tuple[int, float]]:
+        """(user id, distance) of the first face in the frame that matches someone, or None"""
+        if not len(encodings):
+            return None
+        if self.roster is None:
+            face_index.sync(db)
+            return next((m for m in face_index.match(encodings, tolerance) if m is not None), None)
+
+        match = next((m for m in self.roster.match(encodings, tolerance) if m is not None), None)
+        if match is not None or not self.allow_walk_ins:
+            return match
+        face_index.sync(db)
+        for encoding, match in zip(encodings, face_index.match(encodings, tolerance)):
+            if match is not None:
+                self.roster.add(match[0], encoding)
+                self.walk_ins_added += 1
+                return match
+        return None
@@ -0,0 +1,201 @@
+"""
+Collaborative-filtering recommendations ("students who joined X also
+attended Y").
+A batch job builds a binary user x item matrix from EventRegistration and
+Membership, where items are events and clubs, computes item-item cosine
+similarity with one sparse product, and stores the top-N event neighbours
+of every event and club in the EventNeighbor table. Requests only read the
+stored neighbour lists of the user's own events and clubs.
+
+Rebuild the neighbour table (e.g. nightly from cron):
+    python -m app.ai.collaborative [--top-n 20]
+"""
+
+import argparse
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy import and_, delete, func, insert, or_
+from sqlmodel import Session, select
+
+from app.ai.recommendation_cache import bump_model_version
+from app.db.models import Event, EventNeighbor, EventRegistration, Membership
+
+EVENT = "event"
+CLUB = "club"
+DEFAULT_TOP_NEIGHBOURS = 20
+_INSERT_BATCH_SIZE = 5000
+
+
+def compute_neighbours(
+    users: np.ndarray,
+    items: np.ndarray,
+    n_items: int,
+    candidate_items: np.ndarray,
+    top_n: int = DEFAULT_TOP_NEIGHBOURS,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Item-item cosine similarity over (user index, item index) interactions.
+    Only items flagged in the boolean `candidate_items` mask may appear as
+    neighbours. Returns parallel (source item, neighbour item, score) arrays
+    with at most `top_n` neighbours per source item.
+    """
+    n_users = int(users.max()) + 1 if len(users) else 0
+    interactions = sp.csr_matrix(
+        (np.ones(len(users), dtype=np.float32), (users, items)), shape=(n_users, n_items)
+    )
+    interactions.sum_duplicates()
+    interactions.data[:] = 1.0
+
+    counts = np.asarray(interactions.sum(axis=0)).ravel()
+    inverse_norms = np.divide(1.0, np.sqrt(counts), out=np.zeros_like(counts), where=counts > 0)
+    normalized = interactions @ sp.diags(inverse_norms.astype(np.float32))
+    similarity = (normalized.T @ normalized).tocsr()
+    # Drop self-similarity and neighbours that cannot be recommended
+    similarity = similarity @ sp.diags(candidate_items.astype(np.float32))
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    sources, neighbours, scores = [], [], []
+    indptr, indices, data = similarity.indptr, similarity.indices, similarity.data
+    for item in range(n_items):
+        start, end = indptr[item], indptr[item + 1]
+        if start == end:
+            continue
+        row_scores = data[start:end]
+        row_items = indices[start:end]
+        if end - start > top_n:
+            keep = np.argpartition(-row_scores, top_n - 1)[:top_n]
+            row_scores, row_items = row_scores[keep], row_items[keep]
+        sources.append(np.full(len(row_items), item, dtype=np.int64))
+        neighbours.append(row_items.astype(np.int64))
+        scores.append(row_scores)
+
+    if not sources:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    return np.concatenate(sources), np.concatenate(neighbours), np.concatenate(scores)
+
+
+def _id_pairs(result) -> np.ndarray:
+    # Flattening plain ints is far faster than letting NumPy walk Row objects
+    flat = np.fromiter((value for row in result for value in row), dtype=np.int64)
+    return flat.reshape(-1, 2)
+
+
+def build_neighbours(db: Session, top_n: int = DEFAULT_TOP_NEIGHBOURS) -> Dict[str, float]:
+    """Recompute the EventNeighbor table from current registrations and memberships"""
+    started = time.perf_counter()
+    # Core queries on the connection skip ORM result processing for the two big scans
+    connection = db.connection()
+    registrations = _id_pairs(connection.execute(select(EventRegistration.user_id, EventRegistration.event_id)))
+    memberships = _id_pairs(connection.execute(select(Membership.user_id, Membership.club_id)))
+    loaded = time.perf_counter()
+
+    # Item columns: events first, then clubs
+    event_ids, event_columns = np.unique(registrations[:, 1], return_inverse=True)
+    club_ids, club_columns = np.unique(memberships[:, 1], return_inverse=True)
+    _, users = np.unique(np.concatenate([registrations[:, 0], memberships[:, 0]]), return_inverse=True)
+    items = np.concatenate([event_columns, club_columns + len(event_ids)])
+    n_items = len(event_ids) + len(club_ids)
+    candidate_items = np.arange(n_items) < len(event_ids)
+
+    sources, neighbours, scores = compute_neighbours(users, items, n_items, candidate_items, top_n)
+    computed = time.perf_counter()
+
+    item_ids = np.concatenate([event_ids, club_ids])
+    item_types = np.array([EVENT] * len(event_ids) + [CLUB] * len(club_ids), dtype=object)
+    rows = [
+        {"source_type": source_type, "source_id": source_id, "event_id": event_id, "score": score}
+        for source_type, source_id, event_id, score in zip(
+            item_types[sources].tolist(), item_ids[sources].tolist(), event_ids[neighbours].tolist(), scores.tolist()
+        )
+    ]
+
+    db.exec(delete(EventNeighbor))
+    for start in range(0, len(rows), _INSERT_BATCH_SIZE):
+        connection.execute(insert(EventNeighbor), rows[start:start + _INSERT_BATCH_SIZE])
+    bump_model_version(db)
+    db.commit()
+
+    return {
+        "registrations": len(registrations),
+        "memberships": len(memberships),
+        "items": n_items,
+        "neighbours": len(rows),
+        "load_seconds": round(loaded - started, 3),
+        "compute_seconds": round(computed - loaded, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _sources_clause(event_ids: Sequence[int], club_ids: Sequence[int]):
+    clauses = []
+    if event_ids:
+        clauses.append(and_(EventNeighbor.source_type == EVENT, EventNeighbor.source_id.in_(event_ids)))
+    if club_ids:
+        clauses.append(and_(EventNeighbor.source_type == CLUB, EventNeighbor.source_id.in_(club_ids)))
+    return or_(*clauses)
+
+
+def recommend_event_ids(
+    db: Session,
+    registered_event_ids: Sequence[int],
+    club_ids: Sequence[int],
+    limit: int,
+    now: Optional[datetime] = None,
+) -> List[int]:
+    """
+    Upcoming events whose stored neighbour scores, summed over the user's
+    events and clubs, are highest. Empty for users with no history
+    (cold start) or before the first batch build.
+    """
+    if not registered_event_ids and not club_ids:
+        return []
+    total = func.sum(EventNeighbor.score)
+    statement = (
+        select(EventNeighbor.event_id)
+        .join(Event, Event.id == EventNeighbor.event_id)
+        .where(_sources_clause(registered_event_ids, club_ids), Event.date >= (now or datetime.now()))
+        .group_by(EventNeighbor.event_id)
+        .order_by(total.desc(), EventNeighbor.event_id)
+        .limit(limit)
+    )
+    if registered_event_ids:
+        statement = statement.where(EventNeighbor.event_id.notin_(registered_event_ids))
+    return list(db.exec(statement).all())
+
+
+def related_event_ids(db: Session, source_type: str, source_id: int, limit: int) -> List[int]:
+    """Stored neighbours of one event or club, best first"""
+    statement = (
+        select(EventNeighbor.event_id)
+        .where(EventNeighbor.source_type == source_type, EventNeighbor.source_id == source_id)
+        .order_by(EventNeighbor.score.desc(), EventNeighbor.event_id)
+        .limit(limit)
+    )
+    return list(db.exec(statement).all())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild collaborative-filtering event neighbours")
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_NEIGHBOURS, help="Neighbours stored per event or club")
+    args = parser.parse_args()
+
+    from app.db.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    with Session(engine) as db:
+        stats = build_neighbours(db, top_n=args.top_n)
+    print(
+        f"{stats['neighbours']} neighbours for {stats['items']} events/clubs from "
+        f"{stats['registrations']} registrations and {stats['memberships']} memberships "
+        f"(load {stats['load_seconds']}s, compute {stats['compute_seconds']}s, total {stats['total_seconds']}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
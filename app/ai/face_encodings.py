@@ -0,0 +1,95 @@
+"""
+Binary storage for face encodings.
+An encoding is 128 float32 values stored as a 512-byte little-endian blob
+in User.face_embedding. Reading never parses numbers one by one: blobs are
+joined and viewed as one contiguous (N, 128) float32 array.
+
+face_recognition (dlib) is optional so lean deployments can skip it; the
+face routes answer 503 when it is missing.
+"""
+
+import io
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+from sqlalchemy import Select
+from sqlmodel import Session, select
+
+try:
+    import face_recognition
+except ImportError:
+    face_recognition = None
+
+from app.db.models import User
+
+ENCODING_DIM = 128
+ENCODING_DTYPE = np.dtype("<f4")
+ENCODING_BYTES = ENCODING_DIM * ENCODING_DTYPE.itemsize  # 512
+
+
+def encoding_to_bytes(encoding: Sequence[float]) -> bytes:
+    array = np.asarray(encoding, dtype=ENCODING_DTYPE)
+    if array.shape != (ENCODING_DIM,):
+        raise ValueError(f"Face encoding must have {ENCODING_DIM} values, got shape {array.shape}")
+    return array.tobytes()
+
+
+def bytes_to_encoding(blob: bytes) -> np.ndarray:
+    """View one stored blob as a (128,) float32 array (read-only, no copy)"""
+    if len(blob) != ENCODING_BYTES:
+        raise ValueError(f"Face encoding blob must be {ENCODING_BYTES} bytes, got {len(blob)}")
+    return np.frombuffer(blob, dtype=ENCODING_DTYPE)
+
+
+def string_to_encoding(encoding_str: str) -> np.ndarray:
+    """Parse the legacy comma-joined decimal format (only needed by the migration)"""
+    return np.array([float(value) for value in encoding_str.split(",")], dtype=ENCODING_DTYPE)
+
+
+def blobs_to_matrix(blobs: Iterable[bytes]) -> np.ndarray:
+    """Stack stored blobs into one contiguous (N, 128) float32 array with a single copy"""
+    joined = b"".join(blobs)
+    if len(joined) % ENCODING_BYTES:
+        raise ValueError("Face encoding blobs must each be 512 bytes")
+    return np.frombuffer(joined, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_DIM)
+
+
+def load_enrolled_encodings(
+    db: Session, user_ids: Optional[Union[Sequence[int], Select]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (user ids, encodings) for every enrolled user, or for the given users
+    (a list of ids or a select of ids). Returns an int64 array of length N
+    and a float32 array of shape (N, 128).
+    """
+    statement = select(User.id, User.face_embedding).where(User.face_embedding != None)  # noqa: E711
+    if user_ids is not None:
+        statement = statement.where(User.id.in_(user_ids))
+    rows = db.connection().execute(statement.order_by(User.id)).all()
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    return ids, blobs_to_matrix(row[1] for row in rows)
+
+
+def face_recognition_available() -> bool:
+    return face_recognition is not None
+
+
+def decode_image(image_bytes: bytes, max_size: Optional[int] = None) -> np.ndarray:
+    """RGB pixels of an image, scaled down so neither side exceeds max_size"""
+    image = Image.open(io.BytesIO(image_bytes))
+    if max_size:
+        # JPEG can decode straight to a smaller size, which is much cheaper than resizing afterwards
+        image.draft("RGB", (max_size, max_size))
+    image = image.convert("RGB")
+    if max_size:
+        image.thumbnail((max_size, max_size))
+    return np.asarray(image)
+
+
+def encode_faces(image: np.ndarray) -> List[np.ndarray]:
+    """Encodings of every face found in an RGB image"""
+    locations = face_recognition.face_locations(image)
+    if not locations:
+        return []
+    return face_recognition.face_encodings(image, known_face_locations=locations)
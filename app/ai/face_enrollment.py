@@ -0,0 +1,340 @@
+"""
+Bulk face enrollment from a zip archive or a directory of photos.
+Images are keyed by email: `<email>.jpg`, `<email>__<anything>.jpg`, or any
+image inside a folder named `<email>`. Several photos of one user are
+encoded separately and averaged into one encoding.
+
+Photos are decoded, scaled down to FACE_ENROLL_MAX_SIZE and encoded in a
+process pool of FACE_ENROLL_WORKERS, separate from the attendance frame
+pool so an import does not slow down live attendance. Users are handled in
+batches whose encodings are written in one transaction together with the
+batch's failures; progress counters are updated as images complete. The
+face index version is bumped once, when the job ends, so other workers
+reload once rather than after every batch; the worker running the job adds
+each batch to its own index as it goes. Jobs run one at a time per worker
+process, in a background thread.
+
+Start a job from POST /admin/face-enrollment-jobs, or run one offline:
+    python -m app.ai.face_enrollment photos.zip
+"""
+
+import argparse
+import os
+import queue
+import threading
+import zipfile
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, func, insert, update
+from sqlmodel import Session, select
+
+from app.ai.face_encodings import ENCODING_DTYPE, decode_image, encode_faces, encoding_to_bytes
+from app.ai.face_index import bump_face_index_version, face_index
+from app.core.config import FACE_ENROLL_WORKERS, FACE_ENROLL_MAX_SIZE
+from app.core.secure_error_handler import SecureErrorHandler
+from app.db.models import FaceEnrollmentFailure, FaceEnrollmentJob, FaceEnrollmentJobStatus, User
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+_USERS_PER_BATCH = 100
+_PROGRESS_EVERY = 50
+_EMAIL_LOOKUP_CHUNK = 500
+
+Item = Tuple[str, int, str]  # (email, user id, image name)
+
+
+class ImageSource:
+    """Named images from a zip archive or a directory tree"""
+
+    def __init__(self, path: str, delete_when_done: bool = False):
+        self.path = path
+        self.delete_when_done = delete_when_done
+        self._zip: Optional[zipfile.ZipFile] = None
+        if zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+        elif not os.path.isdir(path):
+            raise ValueError("Source must be a zip archive or a directory")
+
+    def names(self) -> List[str]:
+        if self._zip is not None:
+            candidates = [
+                info.filename for info in self._zip.infolist()
+                if not info.is_dir() and info.file_size <= MAX_IMAGE_BYTES
+            ]
+        else:
+            root = Path(self.path)
+            candidates = [
+                file.relative_to(root).as_posix() for file in root.rglob("*")
+                if file.is_file() and file.stat().st_size <= MAX_IMAGE_BYTES
+            ]
+        return sorted(
+            name for name in candidates
+            if PurePosixPath(name).suffix.lower() in IMAGE_EXTENSIONS and not name.startswith("__MACOSX/")
+        )
+
+    def read(self, name: str) -> bytes:
+        if self._zip is not None:
+            return self._zip.read(name)
+        return (Path(self.path) / name).read_bytes()
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+        if self.delete_when_done:
+            os.remove(self.path)
+
+
+def email_for(name: str) -> Optional[str]:
+    path = PurePosixPath(name)
+    candidate = path.stem.split("__", 1)[0]
+    if "@" in candidate:
+        return candidate.strip().lower()
+    for folder in reversed(path.parts[:-1]):
+        if "@" in folder:
+            return folder.strip().lower()
+    return None
+
+
+# Runs inside the worker processes, so it must be module-level and picklable
+def _encode_image_in_worker(data: bytes, max_size: int) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    # Any error is a failure of this image only, e.g. PIL's DecompressionBombError, which is not an OSError
+    try:
+        image = decode_image(data, max_size)
+    except Exception:
+        return None, "Unreadable image"
+    try:
+        encodings = encode_faces(image)
+    except Exception:
+        return None, "Face encoding failed"
+    if not encodings:
+        return None, "No face found"
+    if len(encodings) > 1:
+        return None, "Multiple faces found"
+    return np.asarray(encodings[0], dtype=ENCODING_DTYPE), None
+
+
+def _encode_items(
+    pool: ProcessPoolExecutor, source: ImageSource, items: List[Item], max_size: int, window: int
+) -> Iterator[Tuple[Item, Optional[np.ndarray], Optional[str]]]:
+    """Encode images in order, keeping at most `window` of them read into memory and in the pool"""
+    in_flight = deque()
+    for item in items:
+        try:
+            in_flight.append((item, pool.submit(_encode_image_in_worker, source.read(item[2]), max_size)))
+        except (OSError, zipfile.BadZipFile):
+            yield item, None, "Unreadable image"
+            continue
+        if len(in_flight) >= window:
+            yield _result(*in_flight.popleft())
+    while in_flight:
+        yield _result(*in_flight.popleft())
+
+
+def _result(item: Item, future: Future) -> Tuple[Item, Optional[np.ndarray], Optional[str]]:
+    try:
+        return (item, *future.result())
+    except BrokenProcessPool:
+        # The pool cannot run anything else either: stop the job
+        raise
+    except Exception as e:
+        SecureErrorHandler.log_error(e, "Face enrollment image", item[1])
+        return item, None, "Image could not be processed"
+
+
+def _lookup_users(db: Session, emails: List[str]) -> Dict[str, int]:
+    user_ids = {}
+    for start in range(0, len(emails), _EMAIL_LOOKUP_CHUNK):
+        chunk = emails[start:start + _EMAIL_LOOKUP_CHUNK]
+        rows = db.exec(select(func.lower(User.email), User.id).where(func.lower(User.email).in_(chunk))).all()
+        user_ids.update(rows)
+    return user_ids
+
+
+def _add_progress(db: Session, job_id: int, **counters: int) -> None:
+    if not any(counters.values()):
+        return
+    db.exec(
+        update(FaceEnrollmentJob)
+        .where(FaceEnrollmentJob.id == job_id)
+        .values({name: getattr(FaceEnrollmentJob, name) + value for name, value in counters.items() if value})
+    )
+
+
+def _write_batch(db: Session, job_id: int, encodings: Dict[int, List[np.ndarray]], failures: List[dict]) -> int:
+    """Store averaged encodings and failures in one transaction; returns the number of users enrolled"""
+    connection = db.connection()
+    if encodings:
+        table = User.__table__
+        connection.execute(
+            update(table).where(table.c.id == bindparam("user_id")).values(face_embedding=bindparam("embedding")),
+            [
+                {"user_id": user_id, "embedding": encoding_to_bytes(np.mean(vectors, axis=0))}
+                for user_id, vectors in encodings.items()
+            ],
+        )
+    if failures:
+        connection.execute(insert(FaceEnrollmentFailure), [{"job_id": job_id, **failure} for failure in failures])
+    _add_progress(db, job_id, enrolled_users=len(encodings))
+    db.commit()
+    return len(encodings)
+
+
+def run_job(
+    job_id: int,
+    source: ImageSource,
+    session_factory: Callable[[], Session],
+    workers: int = FACE_ENROLL_WORKERS,
+    max_size: int = FACE_ENROLL_MAX_SIZE,
+) -> None:
+    try:
+        with session_factory() as db:
+            job = db.get(FaceEnrollmentJob, job_id)
+            job.status = FaceEnrollmentJobStatus.running
+            job.started_at = datetime.utcnow()
+            db.add(job)
+            db.commit()
+        status, error = _run(job_id, source, session_factory, workers, max_size), None
+    except Exception as e:
+        SecureErrorHandler.log_error(e, "Face enrollment job")
+        status, error = FaceEnrollmentJobStatus.failed, "Enrollment job failed unexpectedly"
+    finally:
+        source.close()
+    with session_factory() as db:
+        job = db.get(FaceEnrollmentJob, job_id)
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        db.add(job)
+        # Also after a failure, for the batches written before it
+        version = bump_face_index_version(db) if job.enrolled_users else None
+        db.commit()
+    if version is not None:
+        face_index.applied(version)
+
+
+def _run(
+    job_id: int, source: ImageSource, session_factory: Callable[[], Session], workers: int, max_size: int
+) -> FaceEnrollmentJobStatus:
+    names_by_email: Dict[str, List[str]] = defaultdict(list)
+    failures = []
+    names = source.names()
+    for name in names:
+        email = email_for(name)
+        if email is None:
+            failures.append({"email": None, "image": name[:255], "reason": "No email in file name"})
+        else:
+            names_by_email[email].append(name)
+
+    with session_factory() as db:
+        user_ids = _lookup_users(db, list(names_by_email))
+        items: List[Item] = []
+        for email, email_names in names_by_email.items():
+            if email in user_ids:
+                items.extend((email, user_ids[email], name) for name in email_names)
+            else:
+                failures.extend({"email": email, "image": name[:255], "reason": "No user with this email"} for name in email_names)
+        db.exec(
+            update(FaceEnrollmentJob)
+            .where(FaceEnrollmentJob.id == job_id)
+            .values(total_images=len(names), total_users=len(user_ids), processed_images=len(failures), failed_images=len(failures))
+        )
+        if failures:
+            db.connection().execute(insert(FaceEnrollmentFailure), [{"job_id": job_id, **failure} for failure in failures])
+        db.commit()
+
+    # Batches end on user boundaries so a user's photos are averaged together
+    batches, batch, batch_users = [], [], set()
+    for item in items:
+        if item[1] not in batch_users and len(batch_users) >= _USERS_PER_BATCH:
+            batches.append(batch)
+            batch, batch_users = [], set()
+        batch.append(item)
+        batch_users.add(item[1])
+    if batch:
+        batches.append(batch)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in batches:
+            encodings: Dict[int, List[np.ndarray]] = defaultdict(list)
+            batch_failures = []
+            processed = failed = 0
+            with session_factory() as db:
+                for (email, user_id, name), encoding, reason in _encode_items(pool, source, batch, max_size, workers * 4):
+                    if encoding is None:
+                        batch_failures.append({"email": email, "image": name[:255], "reason": reason})
+                        failed += 1
+                    else:
+                        encodings[user_id].append(encoding)
+                    processed += 1
+                    if processed == _PROGRESS_EVERY:
+                        _add_progress(db, job_id, processed_images=processed, failed_images=failed)
+                        db.commit()
+                        processed = failed = 0
+                _add_progress(db, job_id, processed_images=processed, failed_images=failed)
+                _write_batch(db, job_id, encodings, batch_failures)
+            if face_index.loaded:
+                for user_id, vectors in encodings.items():
+                    face_index.add(user_id, np.mean(vectors, axis=0))
+    return FaceEnrollmentJobStatus.completed
+
+
+class EnrollmentJobRunner:
+    """Runs queued jobs one at a time in a background thread"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[int, ImageSource, Callable[[], Session]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: int, source: ImageSource, session_factory: Callable[[], Session]) -> None:
+        self._queue.put((job_id, source, session_factory))
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="face-enrollment", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            job_id, source, session_factory = self._queue.get()
+            try:
+                run_job(job_id, source, session_factory)
+            except Exception as e:
+                # Keep serving the queue; run_job already marks the job failed where it can
+                SecureErrorHandler.log_error(e, "Face enrollment job runner")
+
+
+enrollment_jobs = EnrollmentJobRunner()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Enroll faces in bulk from a zip archive or directory keyed by email")
+    parser.add_argument("source", help="Zip archive or directory of images")
+    parser.add_argument("--workers", type=int, default=FACE_ENROLL_WORKERS, help="Encoding processes")
+    args = parser.parse_args()
+
+    from app.db.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    source = ImageSource(args.source)
+    with Session(engine) as db:
+        job = FaceEnrollmentJob(source=os.path.basename(args.source)[:255])
+        db.add(job)
+        db.commit()
+        job_id = job.id
+    run_job(job_id, source, lambda: Session(engine), workers=args.workers)
+    with Session(engine) as db:
+        job = db.get(FaceEnrollmentJob, job_id)
+        print(
+            f"Job {job.id} {job.status.value}: {job.enrolled_users}/{job.total_users} users enrolled from "
+            f"{job.processed_images}/{job.total_images} images, {job.failed_images} failed"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Process-wide index of enrolled face encodings for attendance matching.
+Encodings are kept in float32 blocks next to their user ids and squared
+norms, so the faces of one frame are matched with one matrix product per
+block (|x - q|^2 = |x|^2 - 2 x.q + |q|^2) and an argmin; the closest face
+wins, not the first one under the tolerance.
+
+Below FACE_INDEX_PARTITION_THRESHOLD there is a single block and every
+encoding is compared. Above it the encodings are split into about sqrt(N)
+k-means cells and a query only scans the FACE_INDEX_PROBES cells with the
+closest centroids, which keeps the cost per frame flat as enrollment grows.
+(A k-d tree is slower than the full scan in 128 dimensions.) Probing is
+approximate: a face near a cell boundary can be missed in one frame and
+found in the next.
+
+The index is loaded at startup and updated in place by enrollment and user
+deletion. Those also bump a version row in GlobalCounter; other workers
+compare it every few seconds and reload. The worker that made the change
+records the new version with applied(), so it does not reload its own edit. Centroids survive reloads and are
+retrained only when enrollment has doubled since they were trained.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.ai.face_encodings import ENCODING_DIM, load_enrolled_encodings
+from app.core.config import FACE_MATCH_TOLERANCE, FACE_INDEX_PARTITION_THRESHOLD, FACE_INDEX_PROBES
+from app.db.models import GlobalCounter
+
+VERSION_COUNTER = "face_index_version"
+_VERSION_CHECK_SECONDS = 5
+_KMEANS_ITERATIONS = 8
+_KMEANS_SAMPLES_PER_CELL = 40
+_ASSIGN_CHUNK = 8192
+
+
+def _nearest_centroids(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    centroid_sq = np.einsum("ij,ij->i", centroids, centroids)
+    cells = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), _ASSIGN_CHUNK):
+        chunk = matrix[start:start + _ASSIGN_CHUNK]
+        cells[start:start + _ASSIGN_CHUNK] = np.argmin(centroid_sq[None, :] - 2.0 * (chunk @ centroids.T), axis=1)
+    return cells
+
+
+def _train_centroids(matrix: np.ndarray, count: int) -> np.ndarray:
+    """Lloyd's k-means on a sample of the encodings"""
+    rng = np.random.default_rng(0)
+    sample = matrix[rng.choice(len(matrix), min(len(matrix), count * _KMEANS_SAMPLES_PER_CELL), replace=False)]
+    centroids = sample[rng.choice(len(sample), count, replace=False)].copy()
+    for _ in range(_KMEANS_ITERATIONS):
+        cells = _nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, cells, sample)
+        counts = np.bincount(cells, minlength=count)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class _Block:
+    """Encodings of one cell in buffers that grow by doubling"""
+
+    def __init__(self, capacity: int = 64):
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.matrix = np.empty((capacity, ENCODING_DIM), dtype=np.float32)
+        self.sq_norms = np.empty(capacity, dtype=np.float32)
+        self.size = 0
+
+    def _reserve(self, needed: int) -> None:
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("ids", "matrix", "sq_norms"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def extend(self, ids: np.ndarray, matrix: np.ndarray) -> None:
+        self._reserve(self.size + len(ids))
+        end = self.size + len(ids)
+        self.ids[self.size:end] = ids
+        self.matrix[self.size:end] = matrix
+        self.sq_norms[self.size:end] = np.einsum("ij,ij->i", matrix, matrix)
+        self.size = end
+
+    def remove(self, row: int) -> Optional[int]:
+        """Swap-remove a row; returns the user id moved into it, if any"""
+        last = self.size - 1
+        moved = None
+        if row != last:
+            self.ids[row] = self.ids[last]
+            self.matrix[row] = self.matrix[last]
+            self.sq_norms[row] = self.sq_norms[last]
+            moved = int(self.ids[row])
+        self.size = last
+        return moved
+
+    def nearest(self, queries: np.ndarray, query_sq: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and squared distances of the closest encoding to each query"""
+        distances = self.sq_norms[:self.size, None] - 2.0 * (self.matrix[:self.size] @ queries.T) + query_sq[None, :]
+        rows = np.argmin(distances, axis=0)
+        return self.ids[rows], distances[rows, np.arange(len(queries))]
+
+
+class FaceIndex:
+    def __init__(
+        self,
+        partition_threshold: float = FACE_INDEX_PARTITION_THRESHOLD,
+        probes: int = FACE_INDEX_PROBES,
+    ):
+        self.partition_threshold = partition_threshold
+        self.probes = probes
+        self._lock = threading.RLock()
+        self._blocks: List[_Block] = [_Block()]
+        self._location: Dict[int, Tuple[int, int]] = {}  # user id -> (cell, row)
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+        self.loaded = False
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return len(self._location)
+
+    def build(self, ids: np.ndarray, matrix: np.ndarray) -> None:
+        """Replace the contents with (N,) user ids and an (N, 128) float32 array"""
+        with self._lock:
+            count = len(ids)
+            if count < self.partition_threshold:
+                self._centroids = None
+            elif self._centroids is None or count > 2 * self._trained_size:
+                self._centroids = _train_centroids(matrix, int(np.sqrt(count)))
+                self._trained_size = count
+
+            if self._centroids is None:
+                cells = np.zeros(count, dtype=np.int64)
+                n_cells = 1
+            else:
+                cells = _nearest_centroids(matrix, self._centroids)
+                n_cells = len(self._centroids)
+            order = np.argsort(cells, kind="stable")
+            bounds = np.searchsorted(cells[order], np.arange(n_cells + 1))
+
+            blocks, location = [], {}
+            for cell in range(n_cells):
+                rows = order[bounds[cell]:bounds[cell + 1]]
+                block = _Block(max(64, len(rows)))
+                block.extend(ids[rows], matrix[rows])
+                for row, user_id in enumerate(block.ids[:block.size].tolist()):
+                    location[user_id] = (cell, row)
+                blocks.append(block)
+            self._blocks, self._location = blocks, location
+
+    def load(self, db: Session) -> None:
+        version = _ensure_version(db)
+        ids, matrix = load_enrolled_encodings(db)
+        with self._lock:
+            self.build(ids, matrix)
+            self._version = version
+            self._version_checked_at = time.monotonic()
+            self.loaded = True
+
+    def sync(self, db: Session, force: bool = False) -> None:
+        """Load on first use, and reload when another worker changed enrollment"""
+        if not self.loaded:
+            self.load(db)
+            return
+        now = time.monotonic()
+        if not force and now - self._version_checked_at < _VERSION_CHECK_SECONDS:
+            return
+        self._version_checked_at = now
+        if _read_version(db) != self._version:
+            self.load(db)
+
+    def _all(self) -> Tuple[np.ndarray, np.ndarray]:
+        blocks = [block for block in self._blocks if block.size]
+        if not blocks:
+            return np.empty(0, dtype=np.int64), np.empty((0, ENCODING_DIM), dtype=np.float32)
+        return (
+            np.concatenate([block.ids[:block.size] for block in blocks]),
+            np.concatenate([block.matrix[:block.size] for block in blocks]),
+        )
+
+    def add(self, user_id: int, encoding: Sequence[float]) -> None:
+        """Add or replace one user's encoding"""
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(1, ENCODING_DIM)
+        with self._lock:
+            self._remove(user_id)
+            count = len(self._location) + 1
+            crossed = self._centroids is None and count >= self.partition_threshold
+            if crossed or (self._centroids is not None and count > 2 * self._trained_size):
+                # Enrollment grew past the point where the current layout pays off: re-partition
+                ids, matrix = self._all()
+                self.build(np.append(ids, user_id), np.concatenate([matrix, encoding]))
+                return
+            cell = 0 if self._centroids is None else int(_nearest_centroids(encoding, self._centroids)[0])
+            block = self._blocks[cell]
+            block.extend(np.array([user_id], dtype=np.int64), encoding)
+            self._location[user_id] = (cell, block.size - 1)
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            self._remove(user_id)
+
+    def applied(self, version: int) -> None:
+        """
+        Record that the change which bumped the version to `version` is
+        already in this index. Only a bump of exactly one is taken: a larger
+        jump includes another worker's change, which needs a reload.
+        """
+        with self._lock:
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def _remove(self, user_id: int) -> None:
+        location = self._location.pop(user_id, None)
+        if location is None:
+            return
+        cell, row = location
+        moved = self._blocks[cell].remove(row)
+        if moved is not None:
+            self._location[moved] = (cell, row)
+
+    def match(
+        self, encodings: Sequence[Sequence[float]], tolerance: float = FACE_MATCH_TOLERANCE
+    ) -> List[Optional[Tuple[int, float]]]:
+        """(user id, distance) of the closest enrolled face for each encoding, or None if none is within tolerance"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if not len(queries):
+            return []
+        query_sq = np.einsum("ij,ij->i", queries, queries)
+        best_ids = np.full(len(queries), -1, dtype=np.int64)
+        best_sq = np.full(len(queries), np.inf, dtype=np.float32)
+
+        with self._lock:
+            if self._centroids is None:
+                cells = range(len(self._blocks))
+            else:
+                centroid_sq = np.einsum("ij,ij->i", self._centroids, self._centroids)
+                distances = centroid_sq[None, :] - 2.0 * (queries @ self._centroids.T)
+                probes = min(self.probes, len(self._centroids))
+                cells = np.unique(np.argpartition(distances, probes - 1, axis=1)[:, :probes]).tolist()
+            for cell in cells:
+                block = self._blocks[cell]
+                if not block.size:
+                    continue
+                ids, squared = block.nearest(queries, query_sq)
+                better = squared < best_sq
+                best_sq[better] = squared[better]
+                best_ids[better] = ids[better]
+
+        distances = np.sqrt(np.maximum(best_sq, 0.0))
+        return [
+            (int(user_id), float(distance)) if user_id >= 0 and distance <= tolerance else None
+            for user_id, distance in zip(best_ids.tolist(), distances.tolist())
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enrolled": len(self._location),
+                "partitioned": self._centroids is not None,
+                "cells": len(self._blocks),
+                "probes": self.probes if self._centroids is not None else None,
+            }
+
+
+face_index = FaceIndex()
+
+
+def _read_version(db: Session) -> Optional[int]:
+    return db.exec(select(GlobalCounter.value).where(GlobalCounter.name == VERSION_COUNTER)).first()
+
+
+def _ensure_version(db: Session) -> int:
+    version = _read_version(db)
+    if version is None:
+        db.add(GlobalCounter(name=VERSION_COUNTER, value=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker seeded it first
+            db.rollback()
+        version = _read_version(db)
+    return version
+
+
+def bump_face_index_version(db: Session) -> int:
+    """
+    Make other workers reload their face index; committed with the caller's
+    transaction. Returns the new version, for FaceIndex.applied().
+    """
+    result = db.exec(
+        update(GlobalCounter)
+        .where(GlobalCounter.name == VERSION_COUNTER)
+        .values(value=GlobalCounter.value + 1)
+    )
+    if result.rowcount == 0:
+        db.add(GlobalCounter(name=VERSION_COUNTER, value=1))
+        return 1
+    # The row stays locked by the UPDATE, so this reads our own increment
+    return _read_version(db)
@@ -0,0 +1,155 @@
+"""
+Frame pipeline for the attendance sockets.
+Decoding a camera frame and running face detection and encoding takes
+hundreds of milliseconds of CPU, so none of it runs on the event loop: the
+base64 payload goes to a small dedicated process pool, which decodes it,
+scales it down to FACE_FRAME_MAX_SIZE and returns the encodings.
+
+Each connection has a one-slot FrameStream. Frames that arrive while the
+previous one is still being processed replace whatever is waiting, so a
+camera that sends faster than the pool can keep up only ever has one frame
+queued and always gets an answer for its newest picture. Every connection
+has at most one frame in the pool, so many kiosks share the workers fairly.
+"""
+
+import asyncio
+import base64
+import itertools
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.ai.face_encodings import ENCODING_DIM, ENCODING_DTYPE, decode_image, encode_faces
+from app.core.config import FACE_FRAME_WORKERS, FACE_FRAME_MAX_SIZE
+
+
+class InvalidFrame(ValueError):
+    pass
+
+
+# Runs inside the worker processes, so it must be module-level and picklable
+def _encode_frame_in_worker(data: str, max_size: int) -> np.ndarray:
+    # Frontend "data:image/jpeg;base64,..." URL bhejta hai
+    try:
+        encoded = data.split(",", 1)[-1]
+        image = decode_image(base64.b64decode(encoded, validate=True), max_size)
+    except Exception as e:
+        # Includes PIL's DecompressionBombError, which is not an OSError
+        raise InvalidFrame(str(e)) from None
+    try:
+        encodings = encode_faces(image)
+    except Exception as e:
+        raise InvalidFrame(str(e)) from None
+    return np.asarray(encodings, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_DIM)
+
+
+class FrameProcessor:
+    def __init__(self, workers: int = FACE_FRAME_WORKERS, max_size: int = FACE_FRAME_MAX_SIZE):
+        self.workers = workers
+        self.max_size = max_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def encode(self, data: str) -> np.ndarray:
+        """(M, 128) encodings of the faces in a data-URL frame; raises InvalidFrame for undecodable input"""
+        future = self._pool().submit(_encode_frame_in_worker, data, self.max_size)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+frame_processor = FrameProcessor()
+
+
+class FrameStream:
+    """One-slot "latest frame wins" buffer and the metrics of one socket"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, label: str):
+        self.id = next(self._ids)
+        self.label = label
+        self.opened_at = time.time()
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.invalid = 0
+        self._processing_seconds = 0.0
+        self._frame: Optional[str] = None
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def put(self, data: str) -> None:
+        self.received += 1
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = data
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def next(self) -> Optional[str]:
+        """The newest unprocessed frame, or None once the socket has closed"""
+        while self._frame is None:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        data, self._frame = self._frame, None
+        return data
+
+    def record(self, seconds: float, valid: bool = True) -> None:
+        self.processed += 1
+        self._processing_seconds += seconds
+        if not valid:
+            self.invalid += 1
+
+    def stats(self) -> dict:
+        return {
+            "id": self.id,
+            "session": self.label,
+            "open_seconds": round(time.time() - self.opened_at, 1),
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "invalid": self.invalid,
+            "avg_processing_ms": round(1000 * self._processing_seconds / self.processed, 1) if self.processed else None,
+        }
+
+
+class FrameStreams:
+    """Open streams on this worker, for monitoring"""
+
+    def __init__(self):
+        self._streams: Dict[int, FrameStream] = {}
+
+    def open(self, label: str) -> FrameStream:
+        stream = FrameStream(label)
+        self._streams[stream.id] = stream
+        return stream
+
+    def close(self, stream: FrameStream) -> None:
+        stream.close()
+        self._streams.pop(stream.id, None)
+
+    def stats(self) -> List[dict]:
+        return [stream.stats() for stream in list(self._streams.values())]
+
+
+frame_streams = FrameStreams()
@@ -0,0 +1,226 @@
+"""
+Per-user cache of GET /events/recommendations results.
+Entries expire after RECOMMENDATION_CACHE_TTL_SECONDS. A user's entry is
+dropped when they register for an event or join a club; every entry is
+dropped when an event is created or the collaborative model is rebuilt.
+
+Global invalidation has to reach every worker, and the model rebuild runs
+in a separate process, so it bumps a version row in the GlobalCounter
+table; each worker compares it at most every few seconds and clears its
+cache when it moves. Per-user invalidation is local to the worker that
+handled the write, so other workers may serve a stale entry for at most
+one TTL.
+
+A background warmer recomputes entries for users who asked for their
+recommendations recently, so the endpoint is usually a dictionary lookup.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.config import (
+    RECOMMENDATION_CACHE_TTL_SECONDS,
+    RECOMMENDATION_CACHE_MAX_ENTRIES,
+    RECOMMENDATION_WARM_INTERVAL_SECONDS,
+    RECOMMENDATION_ACTIVE_WINDOW_SECONDS,
+)
+from app.core.secure_error_handler import SecureErrorHandler
+from app.db.models import GlobalCounter
+from app.schemas import EventPublic
+
+MODEL_VERSION_COUNTER = "recommendation_model_version"
+_VERSION_CHECK_SECONDS = 5
+_WARM_BATCH_SIZE = 200
+
+
+class RecommendationCache:
+    def __init__(
+        self,
+        ttl: float = RECOMMENDATION_CACHE_TTL_SECONDS,
+        max_entries: int = RECOMMENDATION_CACHE_MAX_ENTRIES,
+    ):
+        self._cache: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl)
+        # Bumped on invalidation so a computation that started earlier cannot store a stale result
+        self._epoch = 0
+        self._user_epochs: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._active: "OrderedDict[int, float]" = OrderedDict()
+        self._max_active = max_entries
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[List[EventPublic]]:
+        with self._lock:
+            events = self._cache.get(user_id)
+            if events is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return events
+
+    def contains(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._cache
+
+    def snapshot(self, user_id: int) -> Tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._user_epochs.get(user_id, 0)
+
+    def set(self, user_id: int, events: List[EventPublic], snapshot: Tuple[int, int]) -> None:
+        with self._lock:
+            if snapshot == (self._epoch, self._user_epochs.get(user_id, 0)):
+                self._cache[user_id] = events
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._cache.pop(user_id, None)
+            self._user_epochs[user_id] = self._user_epochs.get(user_id, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._epoch += 1
+
+    def touch(self, user_id: int) -> None:
+        """Record that a user asked for recommendations, so the warmer keeps their entry fresh"""
+        with self._lock:
+            self._active[user_id] = time.monotonic()
+            self._active.move_to_end(user_id)
+            if len(self._active) > self._max_active:
+                self._active.popitem(last=False)
+
+    def recently_active(self, window: float = RECOMMENDATION_ACTIVE_WINDOW_SECONDS) -> List[int]:
+        cutoff = time.monotonic() - window
+        with self._lock:
+            return [user_id for user_id, seen in reversed(self._active.items()) if seen >= cutoff]
+
+    def check_version(self, db: Session, force: bool = False) -> None:
+        """Clear the cache if another worker or the batch job bumped the model version"""
+        now = time.monotonic()
+        if not force and now - self._version_checked_at < _VERSION_CHECK_SECONDS:
+            return
+        self._version_checked_at = now
+        version = db.exec(select(GlobalCounter.value).where(GlobalCounter.name == MODEL_VERSION_COUNTER)).first()
+        if self._version is not None and version != self._version:
+            self.clear()
+        self._version = version
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._cache),
+                "max_entries": int(self._cache.maxsize),
+                "ttl_seconds": self._cache.ttl,
+                "active_users": len(self._active),
+            }
+
+
+recommendation_cache = RecommendationCache()
+
+
+def bump_model_version(db: Session) -> None:
+    """Invalidate cached recommendations in every worker; committed with the caller's transaction"""
+    result = db.exec(
+        update(GlobalCounter)
+        .where(GlobalCounter.name == MODEL_VERSION_COUNTER)
+        .values(value=GlobalCounter.value + 1)
+    )
+    if result.rowcount == 0:
+        db.add(GlobalCounter(name=MODEL_VERSION_COUNTER, value=1))
+    recommendation_cache.clear()
+
+
+def ensure_model_version(db: Session) -> None:
+    if db.get(GlobalCounter, MODEL_VERSION_COUNTER) is None:
+        db.add(GlobalCounter(name=MODEL_VERSION_COUNTER, value=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker seeded it first
+            db.rollback()
+
+
+def cached_recommendations(db: Session, user_id: int) -> List[EventPublic]:
+    """Serve a user's recommendations from the cache, computing and storing them on a miss"""
+    recommendation_cache.check_version(db)
+    events = recommendation_cache.get(user_id)
+    if events is not None:
+        return events
+    return _compute_and_store(db, user_id)
+
+
+def _compute_and_store(db: Session, user_id: int) -> List[EventPublic]:
+    # Imported here: the recommender imports the collaborative job, which imports this module
+    from app.ai.recommendations import recommend_events_for_user
+
+    snapshot = recommendation_cache.snapshot(user_id)
+    events = [
+        EventPublic.model_validate(event, from_attributes=True)
+        for event in recommend_events_for_user(db, user_id)
+    ]
+    recommendation_cache.set(user_id, events, snapshot)
+    return events
+
+
+class RecommendationWarmer:
+    """Background thread that fills cache entries for recently active users"""
+
+    def __init__(self, interval: float = RECOMMENDATION_WARM_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self.warmed = 0
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._session_factory = session_factory
+        with session_factory() as db:
+            ensure_model_version(db)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="recommendation-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def warm_once(self) -> int:
+        warmed = 0
+        with self._session_factory() as db:
+            recommendation_cache.check_version(db, force=True)
+            for user_id in recommendation_cache.recently_active():
+                if self._stop.is_set() or warmed >= _WARM_BATCH_SIZE:
+                    break
+                if recommendation_cache.contains(user_id):
+                    continue
+                _compute_and_store(db, user_id)
+                warmed += 1
+        self.warmed += warmed
+        return warmed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.warm_once()
+            except Exception as e:
+                SecureErrorHandler.log_error(e, "Recommendation cache warming")
+
+
+recommendation_warmer = RecommendationWarmer()
@@ -1,19 +1,211 @@
-from typing import List
-# from sklearn.feature_extraction.text import TfidfVectorizer  # Temporarily disabled for deployment
-# from sklearn.metrics.pairwise import cosine_similarity  # Temporarily disabled for deployment
-# import numpy as np  # Temporarily disabled for deployment
+"""
+Content-based event recommendations.
+Each event's name and description is tokenised and hashed into a sparse
+float32 term vector (log term frequency, L2-normalised). The vectors are
+kept per worker in one CSR matrix, together with id, club and date arrays,
+and document frequencies for IDF weighting.
 
-from app.db.models import User, Event
+A user's profile is the sum of the vectors of the events they registered
+for, plus a smaller weight for events of clubs they belong to. Candidates
+are scored with a single sparse matrix-vector product and the best are
+picked with argpartition, so no Event rows are loaded to rank.
 
-# AI recommendations temporarily disabled for deployment
-def recommend_events_for_user(user: User, all_events: List[Event]) -> List[Event]:
+The matrix is built on first use. New events are appended by create_event,
+and each request also picks up events added by other workers (ids above
+the highest one indexed here).
+"""
+
+import re
+import threading
+import zlib
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sqlmodel import Session, select
+
+from app.ai import collaborative
+from app.ai.trending import trending_events
+from app.db.models import Event, EventRegistration, Membership
+
+N_FEATURES = 1 << 18
+CLUB_EVENT_WEIGHT = 0.5
+DEFAULT_RECOMMENDATIONS = 5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the this to "
+    "we will with you your all join us".split()
+)
+
+
+def _term_vector(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    counts = {}
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOP_WORDS:
+            continue
+        column = zlib.crc32(token.encode()) & (N_FEATURES - 1)
+        counts[column] = counts.get(column, 0) + 1
+    columns = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+    values = 1.0 + np.log(np.array([counts[c] for c in columns], dtype=np.float32))
+    norm = np.linalg.norm(values)
+    return columns, (values / norm if norm else values).astype(np.float32)
+
+
+class EventIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._matrix = sp.csr_matrix((0, N_FEATURES), dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._club_ids = np.empty(0, dtype=np.int64)
+        self._dates = np.empty(0, dtype=np.float64)
+        self._row_of = {}  # event id -> matrix row, assigned as soon as an event is added
+        self._df = np.zeros(N_FEATURES, dtype=np.float32)
+        self._idf_squared = np.ones(N_FEATURES, dtype=np.float32)
+        # Rows added since the last query, merged into the matrix in one step
+        self._pending: List[tuple] = []
+        self._max_id = 0
+        self.loaded = False
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return len(self._ids) + len(self._pending)
+
+    def add_event(self, event_id: int, name: str, description: str, club_id: int, date: datetime) -> None:
+        columns, values = _term_vector(f"{name} {description}")
+        with self._lock:
+            if event_id in self._row_of:
+                return
+            self._row_of[event_id] = len(self._ids) + len(self._pending)
+            self._df[columns] += 1
+            self._pending.append((event_id, club_id, date.timestamp(), columns, values))
+            self._max_id = max(self._max_id, event_id)
+
+    def add_events(self, rows: Iterable[tuple]) -> None:
+        """Add (id, name, description, club_id, date) rows"""
+        for row in rows:
+            self.add_event(*row)
+
+    def sync(self, db: Session) -> None:
+        """Load the index on first use, then pick up events created by other workers"""
+        statement = select(Event.id, Event.name, Event.description, Event.club_id, Event.date).order_by(Event.id)
+        if self.loaded:
+            statement = statement.where(Event.id > self._max_id)
+        self.add_events(db.exec(statement).all())
+        self.loaded = True
+
+    def _compact(self) -> None:
+        if not self._pending:
+            return
+        lengths = [len(row[3]) for row in self._pending]
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        tail = sp.csr_matrix(
+            (
+                np.concatenate([row[4] for row in self._pending]),
+                np.concatenate([row[3] for row in self._pending]),
+                indptr,
+            ),
+            shape=(len(self._pending), N_FEATURES),
+            dtype=np.float32,
+        )
+        self._matrix = sp.vstack([self._matrix, tail], format="csr", dtype=np.float32)
+        self._ids = np.concatenate([self._ids, np.array([row[0] for row in self._pending], dtype=np.int64)])
+        self._club_ids = np.concatenate([self._club_ids, np.array([row[1] for row in self._pending], dtype=np.int64)])
+        self._dates = np.concatenate([self._dates, np.array([row[2] for row in self._pending], dtype=np.float64)])
+        self._pending = []
+        # IDF only changes when events are added, so square it once here instead of per query
+        idf = np.log((1.0 + len(self._ids)) / (1.0 + self._df)) + 1.0
+        self._idf_squared = (idf * idf).astype(np.float32)
+
+    def rank(
+        self,
+        registered_event_ids: Sequence[int],
+        club_ids: Sequence[int],
+        limit: int = DEFAULT_RECOMMENDATIONS,
+        now: Optional[datetime] = None,
+        exclude: Sequence[int] = (),
+    ) -> List[int]:
+        """
+        Ids of the best upcoming events for a user's history, topped up with
+        the latest-dated events. Events in `exclude` are never returned.
+        """
+        with self._lock:
+            self._compact()
+            count = len(self._ids)
+            if count == 0 or limit <= 0:
+                return []
+
+            weights = np.zeros(count, dtype=np.float32)
+            if club_ids:
+                weights[np.isin(self._club_ids, np.asarray(club_ids, dtype=np.int64))] = CLUB_EVENT_WEIGHT
+            registered_rows = np.array(
+                [self._row_of[i] for i in registered_event_ids if i in self._row_of], dtype=np.int64
+            )
+            weights[registered_rows] = 1.0
+
+            excluded = np.zeros(count, dtype=bool)
+            excluded[registered_rows] = True
+            excluded[[self._row_of[i] for i in exclude if i in self._row_of]] = True
+            chosen: List[int] = []
+
+            profile_rows = np.flatnonzero(weights)
+            if len(profile_rows):
+                profile = self._matrix[profile_rows].T @ weights[profile_rows]
+                scores = self._matrix @ (profile * self._idf_squared).astype(np.float32)
+                now_ts = (now or datetime.now()).timestamp()
+                scores[excluded | (self._dates < now_ts)] = 0.0
+                positive = int(np.count_nonzero(scores > 0))
+                k = min(limit, positive)
+                if k:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    top = top[np.argsort(-scores[top], kind="stable")]
+                    chosen = top.tolist()
+                    excluded[top] = True
+
+            if len(chosen) < limit:
+                # No history, or not enough similar events: fall back to the latest-dated events
+                dates = np.where(excluded, -np.inf, self._dates)
+                k = min(limit - len(chosen), int(np.count_nonzero(~excluded)))
+                if k:
+                    latest = np.argpartition(-dates, k - 1)[:k]
+                    chosen.extend(latest[np.argsort(-dates[latest], kind="stable")].tolist())
+
+            return self._ids[chosen].tolist()
+
+
+event_index = EventIndex()
+
+
+def recommend_events_for_user(db: Session, user_id: int, limit: int = DEFAULT_RECOMMENDATIONS) -> List[Event]:
     """
-    Simple fallback recommendation - returns recent events
-    (AI-based recommendations temporarily disabled for deployment)
+    Recommended events for a user, best first: collaborative-filtering
+    neighbours of their events and clubs, then content-based matches. Users
+    with no history get trending events, then the latest-dated events.
     """
-    # Simple fallback: return recent events that user hasn't registered for
-    user_event_ids = {event.id for event in user.events_attending}
-    candidate_events = [event for event in all_events if event.id not in user_event_ids]
-    
-    # Return most recent events
-    return sorted(candidate_events, key=lambda x: x.date, reverse=True)[:5]
\ No newline at end of file
+    registered = db.exec(select(EventRegistration.event_id).where(EventRegistration.user_id == user_id)).all()
+    club_ids = db.exec(select(Membership.club_id).where(Membership.user_id == user_id)).all()
+    if registered or club_ids:
+        event_ids = collaborative.recommend_event_ids(db, registered, club_ids, limit)
+    else:
+        event_ids = [event_id for event_id, _ in trending_events.top(db, limit)]
+    if len(event_ids) < limit:
+        event_index.sync(db)
+        event_ids += event_index.rank(registered, club_ids, limit - len(event_ids), exclude=event_ids)
+    return load_events(db, event_ids)
+
+
+def load_events(db: Session, event_ids: List[int]) -> List[Event]:
+    """Fetch events by id, keeping the given order and skipping deleted ones"""
+    if not event_ids:
+        return []
+    events = {event.id: event for event in db.exec(select(Event).where(Event.id.in_(event_ids))).all()}
+    return [events[event_id] for event_id in event_ids if event_id in events]
+
+
+def index_new_event(event: Event) -> None:
+    """Add a just-created event; a no-op until the index has been loaded"""
+    if event_index.loaded:
+        event_index.add_event(event.id, event.name, event.description, event.club_id, event.date)
@@ -0,0 +1,115 @@
+"""
+Trending events: registrations with exponential time decay.
+Each event's score is sum(exp(-decay * age)) over its registrations. It is
+stored in forward-decay form, log(sum(exp(decay * (t - EPOCH)))), which
+never has to be decayed: adding a registration is one logaddexp on the
+event's row, and ordering by the stored value orders by the decayed score
+at any moment. The column is indexed, and each worker keeps the best
+TRENDING_TOP_K upcoming events in memory, updated on every registration it
+handles and re-read from the index every few seconds for the others.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+
+from app.core.config import TRENDING_HALF_LIFE_HOURS, TRENDING_TOP_K
+from app.db.models import Event, EventTrend
+
+EPOCH = datetime(2024, 1, 1)
+DECAY_PER_SECOND = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 3600)
+_REFRESH_SECONDS = 15
+
+_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+def _log_weight(at: datetime) -> float:
+    return DECAY_PER_SECOND * (at - EPOCH).total_seconds()
+
+
+def _logaddexp(a: float, b: float) -> float:
+    high, low = (a, b) if a >= b else (b, a)
+    return high + math.log1p(math.exp(low - high))
+
+
+def decayed_score(log_score: float, now: Optional[datetime] = None) -> float:
+    """Current value of the score: registrations weighted by 2^(-age / half-life)"""
+    return math.exp(log_score - _log_weight(now or datetime.now()))
+
+
+def record_registration(session: Session, event_id: int, at: Optional[datetime] = None) -> float:
+    """Add one registration to an event's score in the caller's transaction; returns the new stored value"""
+    weight = _log_weight(at or datetime.now())
+    insert = _INSERTS.get(session.get_bind().dialect.name)
+    if insert is not None:
+        # First registration creates the row; concurrent first registrations wait here instead of colliding
+        created = session.exec(
+            insert(EventTrend).values(event_id=event_id, log_score=weight).on_conflict_do_nothing()
+        )
+        if created.rowcount == 1:
+            return weight
+    current = session.exec(
+        select(EventTrend.log_score).where(EventTrend.event_id == event_id).with_for_update()
+    ).first()
+    if current is None:
+        session.add(EventTrend(event_id=event_id, log_score=weight))
+        return weight
+    log_score = _logaddexp(current, weight)
+    session.exec(update(EventTrend).where(EventTrend.event_id == event_id).values(log_score=log_score))
+    return log_score
+
+
+class TrendingTopK:
+    """The K highest-scoring upcoming events, kept in memory per worker"""
+
+    def __init__(self, k: int = TRENDING_TOP_K, refresh_seconds: float = _REFRESH_SECONDS):
+        self.k = k
+        self.refresh_seconds = refresh_seconds
+        self._entries: Dict[int, Tuple[float, datetime]] = {}  # event id -> (log score, event date)
+        self._lock = threading.Lock()
+        self._refreshed_at = 0.0
+
+    def offer(self, event_id: int, log_score: float, event_date: datetime) -> None:
+        """Record a new score; O(K) at worst, independent of the number of events"""
+        with self._lock:
+            if event_id not in self._entries and len(self._entries) >= self.k:
+                lowest = min(self._entries, key=lambda i: self._entries[i][0])
+                if log_score <= self._entries[lowest][0]:
+                    return
+                del self._entries[lowest]
+            self._entries[event_id] = (log_score, event_date)
+
+    def refresh(self, db: Session, force: bool = False) -> None:
+        """Reload from the indexed scores, picking up registrations handled by other workers"""
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_seconds:
+            return
+        rows = db.exec(
+            select(EventTrend.event_id, EventTrend.log_score, Event.date)
+            .join(Event, Event.id == EventTrend.event_id)
+            .where(Event.date >= datetime.now())
+            .order_by(EventTrend.log_score.desc())
+            .limit(self.k)
+        ).all()
+        with self._lock:
+            self._entries = {event_id: (log_score, date) for event_id, log_score, date in rows}
+            self._refreshed_at = now
+
+    def top(self, db: Session, limit: int) -> List[Tuple[int, float]]:
+        """(event id, current decayed score) for the best upcoming events"""
+        self.refresh(db)
+        now = datetime.now()
+        with self._lock:
+            upcoming = [(event_id, log_score) for event_id, (log_score, date) in self._entries.items() if date >= now]
+        upcoming.sort(key=lambda item: item[1], reverse=True)
+        return [(event_id, decayed_score(log_score, now)) for event_id, log_score in upcoming[:limit]]
+
+
+trending_events = TrendingTopK()
@@ -6,12 +6,18 @@ from sqlmodel import Session, select
 from app.db.models import User, UserRole
 
 from app.core.config import JWT_SECRET_KEY, ALGORITHM
+from app.core.principal_cache import Principal, principal_cache
 from app.db.database import get_session
-from app.db.models import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
-def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Annotated[Session, Depends(get_session)]) -> User:
+def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Annotated[Session, Depends(get_session)]) -> Principal:
+    """
+    Resolve the bearer token to the authenticated principal.
+    The JWT is verified on every call; the user lookup is served from the
+    principal cache when possible. Routes that need relationships load the
+    User row themselves via `current_user.id`.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -25,13 +31,17 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Annotate
     except JWTError:
         raise credentials_exception
 
-    user = db.exec(select(User).where(User.email == email)).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = db.exec(select(User).where(User.email == email)).first()
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        principal_cache.set(email, principal)
+    return principal
 
 # Authorization Dependencies
-def get_super_admin(current_user: Annotated[User, Depends(get_current_user)]) -> User:
+def get_super_admin(current_user: Annotated[Principal, Depends(get_current_user)]) -> Principal:
     """
     Dependency to ensure the user has the 'super_admin' role.
     SuperAdmin: Overall head/mentor responsible for managing admins and system-wide operations.
@@ -43,7 +53,7 @@ def get_super_admin(current_user: Annotated[User, Depends(get_current_user)]) ->
         )
     return current_user
 
-def get_admin_or_super_admin(current_user: Annotated[User, Depends(get_current_user)]) -> User:
+def get_admin_or_super_admin(current_user: Annotated[Principal, Depends(get_current_user)]) -> Principal:
     """
     Dependency to ensure the user has 'club_admin' or 'super_admin' role.
     Admin: Can manage clubs and events. SuperAdmin: System-wide management.
@@ -55,7 +65,7 @@ def get_admin_or_super_admin(current_user: Annotated[User, Depends(get_current_u
         )
     return current_user
 
-def get_club_admin(current_user: Annotated[User, Depends(get_current_user)]) -> User:
+def get_club_admin(current_user: Annotated[Principal, Depends(get_current_user)]) -> Principal:
     """
     Dependency to ensure the user has the 'club_admin' role.
     Admin: Responsible for club and event management, can act as coordinators.
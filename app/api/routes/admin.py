@@ -1,44 +1,139 @@
-from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+import tempfile
+from datetime import datetime
+from typing import List, Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, File, Form, UploadFile
+from pydantic import BaseModel
 from sqlmodel import Session, select
 from app.db.models import Club, Event 
 from app.schemas import DashboardStats
 
-from app.db.database import get_session
-from app.db.models import User, UserRole
+from app.ai.face_encodings import face_recognition_available
+from app.ai.face_enrollment import ImageSource, enrollment_jobs
+from app.ai.face_index import face_index, bump_face_index_version
+from app.ai.frame_pipeline import frame_processor, frame_streams
+from app.ai.recommendation_cache import recommendation_cache, recommendation_warmer
+from app.core.principal_cache import Principal, invalidate_user, principal_cache
+from app.core.secure_error_handler import SecureErrorHandler
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, build_page, decode_id_cursor
+from app.db import counters
+from app.db.attendance_writer import attendance_writer
+from app.core.config import FACE_ENROLL_IMPORT_DIR, FACE_ENROLL_MAX_ARCHIVE_MB
+from app.db.database import engine, get_session, get_pool_stats
+from app.db.models import User, UserRole, FaceEnrollmentJob, FaceEnrollmentJobStatus, FaceEnrollmentFailure
 from app.api.deps import get_super_admin
-from app.schemas import UserPublic
+from app.schemas import UserPublic, Page
 
 router = APIRouter()
 
+# --- Define Local Schemas ---
+class FaceEnrollmentFailurePublic(BaseModel):
+    email: Optional[str]
+    image: str
+    reason: str
+
+class FaceEnrollmentJobPublic(BaseModel):
+    id: int
+    source: str
+    status: FaceEnrollmentJobStatus
+    total_images: int
+    processed_images: int
+    failed_images: int
+    total_users: int
+    enrolled_users: int
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    failures: List[FaceEnrollmentFailurePublic] = []
+
 # Naya endpoint
 @router.get("/stats", response_model=DashboardStats)
 def get_dashboard_stats(
     db: Annotated[Session, Depends(get_session)],
-    super_admin: Annotated[User, Depends(get_super_admin)],
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
 ):
     """
     Super Admin dashboard ke liye stats fetch karein.
+    Totals come from the incrementally maintained counters table.
     """
-    total_users = db.exec(select(User)).all()
-    active_clubs = db.exec(select(Club)).all()
-    total_events = db.exec(select(Event)).all()
-
+    totals = counters.read_counters(db)
     return DashboardStats(
-        total_users=len(total_users),
-        active_clubs=len(active_clubs),
-        total_events=len(total_events),
+        total_users=totals[counters.USERS],
+        active_clubs=totals[counters.CLUBS],
+        total_events=totals[counters.EVENTS],
+        # Pending club-admin requests: students waiting for approval to run a club
+        pending_clubs=totals[counters.PENDING_ROLE_REQUESTS],
+        total_memberships=totals[counters.MEMBERSHIPS],
+        total_registrations=totals[counters.REGISTRATIONS],
     )
 
-@router.get("/users", response_model=List[UserPublic])
+@router.get("/db-pool", response_model=dict)
+def get_db_pool_stats(
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
+):
+    """
+    Database connection pool usage for this worker. (Super Admin only)
+    """
+    return get_pool_stats()
+
+@router.get("/auth-cache", response_model=dict)
+def get_auth_cache_stats(
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
+):
+    """
+    Hit/miss counters for the authenticated-principal cache on this worker. (Super Admin only)
+    """
+    return principal_cache.stats()
+
+@router.get("/recommendation-cache", response_model=dict)
+def get_recommendation_cache_stats(
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
+):
+    """
+    Hit/miss counters for the event recommendation cache on this worker. (Super Admin only)
+    """
+    return {**recommendation_cache.stats(), "warmed": recommendation_warmer.warmed}
+
+@router.get("/face-index", response_model=dict)
+def get_face_index_stats(
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
+):
+    """
+    Size and layout of the attendance face index on this worker. (Super Admin only)
+    """
+    return face_index.stats()
+
+@router.get("/attendance-streams", response_model=dict)
+def get_attendance_stream_stats(
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
+):
+    """
+    Frames received, processed and dropped by each open attendance socket on this worker,
+    and the state of its attendance write buffer. (Super Admin only)
+    """
+    return {
+        "frame_workers": frame_processor.workers,
+        "streams": frame_streams.stats(),
+        "writer": attendance_writer.stats(),
+    }
+
+@router.get("/users", response_model=Page[UserPublic])
 def get_all_users(
     db: Annotated[Session, Depends(get_session)],
-    super_admin: Annotated[User, Depends(get_super_admin)],
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
 ):
     """
-    Get a list of all users. (Super Admin only)
+    Get a page of users ordered by id. (Super Admin only)
     """
-    return db.exec(select(User)).all()
+    statement = select(User).order_by(User.id).limit(limit + 1)
+    last_id = decode_id_cursor(cursor)
+    if last_id is not None:
+        statement = statement.where(User.id > last_id)
+    users = db.exec(statement).all()
+    return build_page(users, limit, key=lambda user: (user.id,))
 
 
 @router.put("/users/{user_id}/role", response_model=UserPublic)
@@ -46,7 +141,7 @@ def update_user_role(
     user_id: int,
     new_role: UserRole,
     db: Annotated[Session, Depends(get_session)],
-    super_admin: Annotated[User, Depends(get_super_admin)],
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
 ):
     """
     Update a user's role. (Super Admin only)
@@ -59,6 +154,7 @@ def update_user_role(
     db.add(user_to_update)
     db.commit()
     db.refresh(user_to_update)
+    invalidate_user(user_to_update)
     return user_to_update
 
 
@@ -66,7 +162,7 @@ def update_user_role(
 def delete_user(
     user_id: int,
     db: Annotated[Session, Depends(get_session)],
-    super_admin: Annotated[User, Depends(get_super_admin)],
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
 ):
     """
     Delete a user. (Super Admin only)
@@ -79,12 +175,106 @@ def delete_user(
     if user_to_delete.id == super_admin.id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Super admin cannot delete themselves")
         
+    email = user_to_delete.email
+    enrolled = user_to_delete.face_embedding is not None
     db.delete(user_to_delete)
+    version = bump_face_index_version(db) if enrolled else None
     db.commit()
+    # After the commit, so a concurrent request cannot re-cache the deleted row
+    principal_cache.invalidate(email)
+    face_index.remove(user_id)
+    if version is not None:
+        face_index.applied(version)
     return {"message": f"User with ID {user_id} deleted successfully."}
 
 
+_COPY_CHUNK_BYTES = 1024 * 1024
+
 
+def _enrollment_source(file: Optional[UploadFile], directory: Optional[str]) -> ImageSource:
+    if (file is None) == (directory is None):
+        raise SecureErrorHandler.handle_validation_error("source", "Upload a zip archive or name a directory, not both")
+    if directory is not None:
+        if not FACE_ENROLL_IMPORT_DIR:
+            raise SecureErrorHandler.handle_validation_error("directory", "Directory imports are not enabled")
+        root = os.path.realpath(FACE_ENROLL_IMPORT_DIR)
+        path = os.path.realpath(os.path.join(root, directory))
+        if os.path.commonpath([root, path]) != root or not os.path.isdir(path):
+            raise SecureErrorHandler.handle_validation_error("directory", "Directory not found")
+        return ImageSource(path)
 
+    if not file.filename or not file.filename.lower().endswith(".zip"):
+        raise SecureErrorHandler.handle_validation_error("file", "Only zip archives are allowed")
+    max_bytes = FACE_ENROLL_MAX_ARCHIVE_MB * 1024 * 1024
+    too_large = SecureErrorHandler.handle_validation_error("file", f"Archive must be smaller than {FACE_ENROLL_MAX_ARCHIVE_MB}MB")
+    if file.size and file.size > max_bytes:
+        raise too_large
+    # The upload is gone once the request ends, so the job reads its own copy.
+    # file.size is not always known, so the limit is also enforced while copying
+    with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as copy:
+        copied = 0
+        while chunk := file.file.read(_COPY_CHUNK_BYTES):
+            copied += len(chunk)
+            if copied > max_bytes:
+                break
+            copy.write(chunk)
+    if copied > max_bytes:
+        os.remove(copy.name)
+        raise too_large
+    try:
+        return ImageSource(copy.name, delete_when_done=True)
+    except ValueError:
+        os.remove(copy.name)
+        raise SecureErrorHandler.handle_validation_error("file", "Invalid zip archive")
 
 
+@router.post("/face-enrollment-jobs", response_model=FaceEnrollmentJobPublic, status_code=status.HTTP_202_ACCEPTED)
+def start_face_enrollment_job(
+    db: Annotated[Session, Depends(get_session)],
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
+    file: Optional[UploadFile] = File(default=None),
+    directory: Optional[str] = Form(default=None),
+):
+    """
+    Enroll faces in bulk from a zip archive, or from a directory under
+    FACE_ENROLL_IMPORT_DIR, of images named by email. Runs in the
+    background; poll the returned job for progress. (Super Admin only)
+    """
+    if not face_recognition_available():
+        raise HTTPException(status_code=503, detail="Face recognition is not available on this server.")
+    source = _enrollment_source(file, directory)
+    try:
+        job = FaceEnrollmentJob(source=(directory or file.filename)[:255], created_by_id=super_admin.id)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+    except Exception:
+        # Deletes the uploaded copy; the job that would have cleaned it up never starts
+        source.close()
+        raise
+    enrollment_jobs.submit(job.id, source, lambda: Session(engine))
+    return FaceEnrollmentJobPublic.model_validate(job, from_attributes=True)
+
+
+@router.get("/face-enrollment-jobs/{job_id}", response_model=FaceEnrollmentJobPublic)
+def get_face_enrollment_job(
+    job_id: int,
+    db: Annotated[Session, Depends(get_session)],
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
+    failures_limit: int = Query(100, ge=0, le=1000),
+):
+    """
+    Progress of a bulk enrollment job and its first failed images. (Super Admin only)
+    """
+    job = db.get(FaceEnrollmentJob, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    failures = db.exec(
+        select(FaceEnrollmentFailure)
+        .where(FaceEnrollmentFailure.job_id == job_id)
+        .order_by(FaceEnrollmentFailure.id)
+        .limit(failures_limit)
+    ).all()
+    response = FaceEnrollmentJobPublic.model_validate(job, from_attributes=True)
+    response.failures = [FaceEnrollmentFailurePublic.model_validate(f, from_attributes=True) for f in failures]
+    return response
@@ -1,54 +1,56 @@
 from datetime import datetime, timedelta
 from typing import Annotated, Dict, List
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, func
-from app.db.database import get_session
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.database import get_async_read_session
 from app.db.models import User, Club, Event, Membership, EventRegistration, Announcement
 from app.api.deps import get_current_user
+from app.core.principal_cache import Principal
 
 router = APIRouter()
 
 @router.get("/dashboard-stats")
 async def get_dashboard_stats(
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_session)]
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_async_read_session)]
 ):
     """Get overall dashboard statistics"""
     
     # Total counts
-    total_users = db.exec(select(func.count(User.id))).first()
-    total_clubs = db.exec(select(func.count(Club.id))).first()
-    total_events = db.exec(select(func.count(Event.id))).first()
+    total_users = (await db.exec(select(func.count(User.id)))).first()
+    total_clubs = (await db.exec(select(func.count(Club.id)))).first()
+    total_events = (await db.exec(select(func.count(Event.id)))).first()
     
     # Active events (future events)
-    active_events = db.exec(
+    active_events = (await db.exec(
         select(func.count(Event.id)).where(Event.date >= datetime.now())
-    ).first()
+    )).first()
     
     # Recent registrations (last 30 days)
     thirty_days_ago = datetime.now() - timedelta(days=30)
-    recent_users = db.exec(
+    recent_users = (await db.exec(
         select(func.count(User.id)).where(User.id >= 1)  # Assuming auto-increment IDs
-    ).first()
+    )).first()
     
     # Most popular clubs (by member count)
-    popular_clubs = db.exec(
+    popular_clubs = (await db.exec(
         select(Club.name, func.count(Membership.user_id).label('member_count'))
         .join(Membership, Club.id == Membership.club_id, isouter=True)
         .group_by(Club.id, Club.name)
         .order_by(func.count(Membership.user_id).desc())
         .limit(5)
-    ).all()
+    )).all()
     
     # Upcoming events with registration counts
-    upcoming_events = db.exec(
+    upcoming_events = (await db.exec(
         select(Event.name, Event.date, func.count(EventRegistration.user_id).label('registrations'))
         .join(EventRegistration, Event.id == EventRegistration.event_id, isouter=True)
         .where(Event.date >= datetime.now())
         .group_by(Event.id, Event.name, Event.date)
         .order_by(Event.date)
         .limit(5)
-    ).all()
+    )).all()
     
     return {
         "totals": {
@@ -74,35 +76,35 @@ async def get_dashboard_stats(
 @router.get("/club-analytics/{club_id}")
 async def get_club_analytics(
     club_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_session)]
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_async_read_session)]
 ):
     """Get analytics for a specific club"""
     
     # Verify club exists and user has access
-    club = db.get(Club, club_id)
+    club = await db.get(Club, club_id)
     if not club:
         raise HTTPException(status_code=404, detail="Club not found")
     
     # Member count over time (simplified - just current count)
-    member_count = db.exec(
+    member_count = (await db.exec(
         select(func.count(Membership.user_id)).where(Membership.club_id == club_id)
-    ).first()
+    )).first()
     
     # Events hosted by this club
-    club_events = db.exec(
+    club_events = (await db.exec(
         select(Event.name, Event.date, func.count(EventRegistration.user_id).label('registrations'))
         .join(EventRegistration, Event.id == EventRegistration.event_id, isouter=True)
         .where(Event.club_id == club_id)
         .group_by(Event.id, Event.name, Event.date)
         .order_by(Event.date.desc())
         .limit(10)
-    ).all()
+    )).all()
     
     # Recent announcements count
-    announcements_count = db.exec(
+    announcements_count = (await db.exec(
         select(func.count(Announcement.id)).where(Announcement.club_id == club_id)
-    ).first()
+    )).first()
     
     return {
         "club_name": club.name,
@@ -121,31 +123,31 @@ async def get_club_analytics(
 
 @router.get("/user-activity")
 async def get_user_activity(
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_session)]
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_async_read_session)]
 ):
     """Get current user's activity statistics"""
     
     # User's club memberships
-    user_clubs = db.exec(
+    user_clubs = (await db.exec(
         select(Club.name)
         .join(Membership, Club.id == Membership.club_id)
         .where(Membership.user_id == current_user.id)
-    ).all()
+    )).all()
     
     # User's event registrations
-    user_events = db.exec(
+    user_events = (await db.exec(
         select(Event.name, Event.date)
         .join(EventRegistration, Event.id == EventRegistration.event_id)
         .where(EventRegistration.user_id == current_user.id)
         .where(Event.date >= datetime.now())
         .order_by(Event.date)
-    ).all()
+    )).all()
     
     return {
         "clubs_joined": len(user_clubs),
         "upcoming_events": len(user_events),
-        "clubs": [club.name for club in user_clubs],
+        "clubs": list(user_clubs),
         "events": [
             {"name": event.name, "date": event.date.isoformat()}
             for event in user_events
@@ -1,98 +1,246 @@
-from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, WebSocket, WebSocketDisconnect
+from typing import List, Annotated, Optional
+import asyncio
+import threading
+from time import perf_counter
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, WebSocket, WebSocketDisconnect, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
 from pydantic import BaseModel
-# import face_recognition  # Temporarily disabled for deployment
-# import numpy as np  # Temporarily disabled for deployment
-import io
-from PIL import Image
-import json
-import base64
 
+from app.ai.face_encodings import face_recognition_available
+from app.ai.frame_pipeline import FrameStream, InvalidFrame, frame_processor, frame_streams
+from app.ai.attendance_sessions import AttendanceSession
+from app.core.config import AUTH_CACHE_TTL_SECONDS
+from app.core.qr_tokens import InvalidQRToken, issue_token, replay_cache, verify_token
 from app.core.secure_error_handler import SecureErrorHandler, SecureValidator
+from app.db.attendance_writer import attendance_writer
 from app.db.database import get_session
-from app.db.models import User, AttendanceRecord
-from app.api.deps import get_current_user
+from app.db.models import UserRole, Event, EventRegistration
+from app.api.deps import get_current_user, get_admin_or_super_admin
+from app.core.principal_cache import Principal
 
 router = APIRouter()
 
-# Helper function to convert string back to numpy array
-# Face recognition functions temporarily disabled for deployment
-# def string_to_encoding(encoding_str: str) -> np.ndarray:
-#     return np.array([float(val) for val in encoding_str.split(',')])
-
-# Face recognition attendance temporarily disabled for deployment
-# # WebSocket ka URL ab general ho gaya hai
-# @router.websocket("/ws/general")
-# async def attendance_websocket(websocket: WebSocket, notes: str = "General Attendance", db: Session = Depends(get_session)):
-#     await websocket.accept()
-    
-#     # 1. Sabhi enrolled students (jinka face data hai) ko database se load karein
-#     all_enrolled_users = db.exec(select(User).where(User.face_encoding != None)).all()
-    
-#     known_face_encodings = []
-#     known_face_users = []
-    
-#     for user in all_enrolled_users:
-#         known_face_encodings.append(string_to_encoding(user.face_encoding))
-#         known_face_users.append(user)
-
-#     if not known_face_encodings:
-#         await websocket.close(code=1008, reason="No enrolled faces found in the system.")
-#         return
-
-#     try:
-#         while True:
-#             # 2. Frontend se image data receive karein
-#             data = await websocket.receive_text()
-            
-#             header, encoded = data.split(",", 1)
-#             image_data = base64.b64decode(encoded)
-#             image = Image.open(io.BytesIO(image_data)).convert("RGB")
-#             image_np = np.array(image)
-
-#             # 3. Image mein face dhoondhein aur recognize karein
-#             face_locations = face_recognition.face_locations(image_np)
-#             unknown_encodings = face_recognition.face_encodings(image_np, face_locations)
-
-#             recognized_user = None
-#             for encoding in unknown_encodings:
-#                 matches = face_recognition.compare_faces(known_face_encodings, encoding, tolerance=0.5)
-                
-#                 if True in matches:
-#                     first_match_index = matches.index(True)
-#                     recognized_user = known_face_users[first_match_index]
-                    
-#                     # 4. Check karein ki kya is user ki attendance aaj pehle se mark ho chuki hai
-#                     today = date.today()
-#                     start_of_day = datetime.combine(today, time.min)
-#                     end_of_day = datetime.combine(today, time.max)
-                    
-#                     existing_record = db.exec(
-#                         select(AttendanceRecord).where(
-#                             AttendanceRecord.user_id == recognized_user.id,
-#                             AttendanceRecord.timestamp >= start_of_day,
-#                             AttendanceRecord.timestamp <= end_of_day,
-#                             AttendanceRecord.event_id == None # Sirf general attendance check karein
-#                         )
-#                     ).first()
-                    
-#                     if not existing_record:
-#                         # 5. Nayi attendance mark karein
-#                         new_record = AttendanceRecord(user_id=recognized_user.id, notes=notes)
-#                         db.add(new_record)
-#                         db.commit()
-#                         await websocket.send_json({"status": "SUCCESS", "name": recognized_user.full_name, "id": recognized_user.id})
-#                     else:
-#                         await websocket.send_json({"status": "ALREADY_MARKED", "name": recognized_user.full_name, "id": recognized_user.id})
-                    
-#                     break
-            
-#             if not recognized_user:
-#                 await websocket.send_json({"status": "NOT_FOUND"})
-
-#     except WebSocketDisconnect:
-#         SecureErrorHandler.log_error(Exception("WebSocket disconnected"), "General Attendance WebSocket")
-#     except Exception as e:
-#         SecureErrorHandler.log_error(e, "General Attendance WebSocket")
-#         await websocket.close(code=1011, reason="An internal error occurred")
\ No newline at end of file
+# --- Define Local Schemas ---
+class QRTokenPublic(BaseModel):
+    token: str
+    expires_at: int
+
+class QRCheckIn(BaseModel):
+    token: str
+
+class QRCheckInResult(BaseModel):
+    status: str
+    id: Optional[int] = None
+
+# event id -> ids of the users who may take its attendance; None if the event does not exist
+_event_staff: TTLCache = TTLCache(maxsize=1024, ttl=AUTH_CACHE_TTL_SECONDS)
+_event_staff_lock = threading.Lock()
+
+def _authorize_socket(token: str, db: Session) -> Principal:
+    return get_admin_or_super_admin(get_current_user(token, db))
+
+
+def _authorize_event_socket(token: str, db: Session, event_id: int) -> Principal:
+    current_user = get_current_user(token, db)
+    event = db.get(Event, event_id)
+    if event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    # Club admin, coordinator, sub-coordinator, ya super admin hi attendance le sakte hain
+    is_authorized = (
+        event.club.admin_id == current_user.id or
+        event.club.coordinator_id == current_user.id or
+        event.club.sub_coordinator_id == current_user.id or
+        current_user.role == UserRole.super_admin
+    )
+    if not is_authorized:
+        raise HTTPException(status_code=403, detail="Not authorized to take attendance for this event")
+    return current_user
+
+
+def _event_staff_ids(db: Session, event_id: int) -> Optional[frozenset]:
+    with _event_staff_lock:
+        if event_id in _event_staff:
+            return _event_staff[event_id]
+    event = db.get(Event, event_id)
+    staff = None
+    if event is not None:
+        staff = frozenset(
+            user_id for user_id in (event.club.admin_id, event.club.coordinator_id, event.club.sub_coordinator_id)
+            if user_id is not None
+        )
+    with _event_staff_lock:
+        _event_staff[event_id] = staff
+    return staff
+
+
+def _mark_attendance(db: Session, session: AttendanceSession, encodings, notes: str) -> dict:
+    """Match one frame's faces and record attendance; runs on the threadpool"""
+    # Session ke faces mein sabse paas wala face dhoondhein
+    match = session.match(db, encodings)
+    if match is None:
+        return {"status": "NOT_FOUND"}
+
+    user_id = match[0]
+    name = session.name(db, user_id)
+    if name is None:
+        # Deleted after this worker last synced its index
+        return {"status": "NOT_FOUND"}
+
+    # Aaj pehle se mark hai? Memory se jawab, database tak nahi jaate
+    if not attendance_writer.mark(user_id, session.event_id, notes):
+        return {"status": "ALREADY_MARKED", "name": name, "id": user_id}
+    return {"status": "SUCCESS", "name": name, "id": user_id}
+
+
+async def _receive_frames(websocket: WebSocket, stream: FrameStream) -> None:
+    try:
+        while True:
+            stream.put(await websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stream.close()
+
+
+async def _run_session(websocket: WebSocket, db: Session, session: AttendanceSession, notes: str) -> None:
+    if session.size == 0 and not session.allow_walk_ins:
+        await websocket.close(code=1008, reason="No enrolled faces found for this session.")
+        return
+
+    label = f"event {session.event_id}" if session.event_id is not None else "general"
+    stream = frame_streams.open(label)
+    # Frames are read continuously; the loop below only ever handles the newest one
+    receiver = asyncio.create_task(_receive_frames(websocket, stream))
+    try:
+        while True:
+            data = await stream.next()
+            if data is None:
+                break
+            started = perf_counter()
+            try:
+                unknown_encodings = await frame_processor.encode(data)
+            except InvalidFrame:
+                stream.record(perf_counter() - started, valid=False)
+                await websocket.send_json({"status": "INVALID_FRAME"})
+                continue
+            reply = await run_in_threadpool(_mark_attendance, db, session, unknown_encodings, notes)
+            stream.record(perf_counter() - started)
+            await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        if not stream.closed:
+            SecureErrorHandler.log_error(e, "Attendance WebSocket")
+            await websocket.close(code=1011, reason="An internal error occurred")
+    finally:
+        receiver.cancel()
+        frame_streams.close(stream)
+
+
+# WebSocket ka URL ab general ho gaya hai
+@router.websocket("/ws/general")
+async def attendance_websocket(
+    websocket: WebSocket,
+    token: str,
+    notes: str = "General Attendance",
+    db: Session = Depends(get_session),
+):
+    """
+    Live face attendance for club admins. Send the access token as ?token=
+    and one data-URL image per message; each frame is matched against
+    every enrolled face.
+    """
+    try:
+        # Token check and user lookup use the sync session, so they run on the threadpool
+        await run_in_threadpool(_authorize_socket, token, db)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    await websocket.accept()
+
+    if not face_recognition_available():
+        await websocket.close(code=1011, reason="Face recognition is not available on this server.")
+        return
+    session = await run_in_threadpool(AttendanceSession.general, db)
+    await _run_session(websocket, db, session, notes)
+
+
+@router.websocket("/ws/events/{event_id}")
+async def event_attendance_websocket(
+    websocket: WebSocket,
+    event_id: int,
+    token: str,
+    walk_in_ids: List[int] = Query(default=[]),
+    allow_walk_ins: bool = False,
+    notes: str = "Event Attendance",
+    db: Session = Depends(get_session),
+):
+    """
+    Live face attendance for one event, matched only against the faces of
+    its registered users and the given walk-ins. With allow_walk_ins,
+    unregistered students are recognised too. Open to the event club's
+    admin and coordinators.
+    """
+    try:
+        await run_in_threadpool(_authorize_event_socket, token, db, event_id)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    await websocket.accept()
+
+    if not face_recognition_available():
+        await websocket.close(code=1011, reason="Face recognition is not available on this server.")
+        return
+    session = await run_in_threadpool(AttendanceSession.for_event, db, event_id, walk_in_ids, allow_walk_ins)
+    await _run_session(websocket, db, session, notes)
+
+
+@router.get("/events/{event_id}/qr-token", response_model=QRTokenPublic)
+def get_check_in_token(
+    event_id: int,
+    db: Annotated[Session, Depends(get_session)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
+):
+    """
+    A short-lived signed QR token that checks the current user in to an
+    event they registered for. Fetch a new one when it expires.
+    """
+    if db.get(Event, event_id) is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if db.get(EventRegistration, (current_user.id, event_id)) is None:
+        raise HTTPException(status_code=403, detail="You are not registered for this event")
+    token, expires_at = issue_token(current_user.id, event_id)
+    return QRTokenPublic(token=token, expires_at=expires_at)
+
+
+@router.post("/events/{event_id}/check-in", response_model=QRCheckInResult)
+def qr_check_in(
+    event_id: int,
+    check_in: QRCheckIn,
+    db: Annotated[Session, Depends(get_session)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
+):
+    """
+    Scanner endpoint for QR check-in, open to the event club's admin and
+    coordinators. The token is verified from its signature alone and each
+    token is accepted once; attendance goes through the batched writer.
+    """
+    staff = _event_staff_ids(db, event_id)
+    if staff is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if current_user.id not in staff and current_user.role != UserRole.super_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to take attendance for this event")
+
+    try:
+        token = verify_token(check_in.token, event_id)
+    except InvalidQRToken as e:
+        return QRCheckInResult(status="EXPIRED" if str(e) == "expired" else "INVALID_TOKEN")
+    if not replay_cache.first_use(token):
+        return QRCheckInResult(status="ALREADY_USED", id=token.user_id)
+
+    # Aaj pehle se mark hai? Memory se jawab, database tak nahi jaate
+    if not attendance_writer.mark(token.user_id, event_id, "QR Check-in"):
+        return QRCheckInResult(status="ALREADY_MARKED", id=token.user_id)
+    return QRCheckInResult(status="SUCCESS", id=token.user_id)
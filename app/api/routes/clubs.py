@@ -1,31 +1,39 @@
 from typing import List, Annotated, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, Form, File, UploadFile
-from sqlmodel import Session, select
-from twilio.rest import Client
+from fastapi import APIRouter, Depends, HTTPException, status, Form, File, UploadFile, Query
+from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, func
 import cloudinary
 import cloudinary.uploader
 
-from app.core.config import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_WHATSAPP_NUMBER
+from app.ai import collaborative
+from app.ai.recommendation_cache import recommendation_cache
+from app.ai.recommendations import load_events
+from app.core.notifications import enqueue_whatsapp, notifications_enabled, wake_dispatcher
 from app.core.secure_error_handler import SecureErrorHandler, SecureValidator
-from app.db.database import get_session
-from app.db.models import User, Club, UserRole, Announcement, Membership
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, build_page, decode_id_cursor
+from app.db.database import get_session, get_read_session, run_write
+from app.db.models import User, Club, UserRole, Announcement, Membership, NotificationOutbox, NotificationStatus
 from app.api.deps import get_current_user, get_admin_or_super_admin, get_super_admin
-from app.schemas import ClubCreate, ClubPublic, ClubWithMembersAndEvents, UserPublic, AnnouncementCreate, AnnouncementPublic
+from app.core.principal_cache import Principal
+from app.schemas import ClubCreate, ClubPublic, ClubWithMembersAndEvents, UserPublic, AnnouncementCreate, AnnouncementPublic, AnnouncementDeliveryStats, EventPublic, Page
 
 router = APIRouter()
 
-# Initialize Twilio Client
-if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
-    twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-else:
-    twilio_client = None
+def _can_manage_announcements(club: Club, user: Principal) -> bool:
+    return (
+        club.admin_id == user.id or
+        club.coordinator_id == user.id or
+        club.sub_coordinator_id == user.id or
+        user.role == UserRole.super_admin
+    )
 
 # --- CRUD for Clubs ---
 @router.post("/", response_model=ClubPublic, status_code=status.HTTP_201_CREATED)
 def create_club(
     db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_admin_or_super_admin)],
+    current_user: Annotated[Principal, Depends(get_admin_or_super_admin)],
     # Required form fields
     name: str = Form(...),
     description: str = Form(...),
@@ -89,23 +97,45 @@ def create_club(
     return club
 
 # ... (THE REST OF YOUR FUNCTIONS LIKE GET, UPDATE, DELETE, ETC. REMAIN THE SAME) ...
-@router.get("/", response_model=List[ClubPublic])
-def get_all_clubs(db: Annotated[Session, Depends(get_session)]):
-    return db.exec(select(Club)).all()
+@router.get("/", response_model=Page[ClubPublic])
+def get_all_clubs(
+    db: Annotated[Session, Depends(get_read_session)],
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    List clubs ordered by id. Pass the returned `next_cursor` back as
+    `cursor` to fetch the following page.
+    """
+    statement = select(Club).options(selectinload(Club.admin)).order_by(Club.id).limit(limit + 1)
+    last_id = decode_id_cursor(cursor)
+    if last_id is not None:
+        statement = statement.where(Club.id > last_id)
+    clubs = db.exec(statement).all()
+    return build_page(clubs, limit, key=lambda club: (club.id,))
 
 @router.get("/{club_id}", response_model=ClubWithMembersAndEvents)
-def get_club_by_id(club_id: int, db: Annotated[Session, Depends(get_session)]):
+def get_club_by_id(club_id: int, db: Annotated[Session, Depends(get_read_session)]):
     club = db.get(Club, club_id)
     if not club:
         raise HTTPException(status_code=404, detail="Club not found")
     return club
 
+@router.get("/{club_id}/related-events", response_model=List[EventPublic])
+def get_related_events_for_club(
+    club_id: int,
+    db: Annotated[Session, Depends(get_read_session)],
+    limit: int = Query(5, ge=1, le=20),
+):
+    """Events most often attended by members of this club"""
+    return load_events(db, collaborative.related_event_ids(db, collaborative.CLUB, club_id, limit))
+
 @router.put("/{club_id}", response_model=ClubPublic)
 def update_existing_club(
     club_id: int, 
     club_update: ClubCreate,
     db: Annotated[Session, Depends(get_session)], 
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)]
 ):
     club = db.get(Club, club_id)
     if not club:
@@ -126,7 +156,7 @@ def update_existing_club(
 def delete_existing_club(
     club_id: int, 
     db: Annotated[Session, Depends(get_session)], 
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)]
 ):
     club = db.get(Club, club_id)
     if not club:
@@ -141,7 +171,7 @@ def delete_existing_club(
 @router.post("/{club_id}/join", response_model=UserPublic)
 def join_club(
     club_id: int, db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)]
 ):
     club = db.get(Club, club_id)
     if not club:
@@ -149,60 +179,85 @@ def join_club(
     existing_membership = db.exec(select(Membership).where(Membership.user_id == current_user.id, Membership.club_id == club_id)).first()
     if existing_membership:
         raise HTTPException(status_code=400, detail="User is already a member of this club")
-    membership = Membership(user_id=current_user.id, club_id=club_id)
-    db.add(membership)
-    db.commit()
+    user_id = current_user.id
+
+    def _join(session: Session) -> None:
+        session.add(Membership(user_id=user_id, club_id=club_id))
+
+    try:
+        run_write(db, _join)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="User is already a member of this club")
+    recommendation_cache.invalidate_user(user_id)
     return current_user
 
 @router.post("/{club_id}/announcements", response_model=AnnouncementPublic, status_code=status.HTTP_201_CREATED)
 def create_announcement_for_club(
     club_id: int, announcement_in: AnnouncementCreate, db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)]
 ):
     club = db.get(Club, club_id)
     if not club:
         raise HTTPException(status_code=404, detail="Club not found")
     
     # Allow club admin, coordinator, sub-coordinator, or super admin to post announcements
-    is_authorized = (
-        club.admin_id == current_user.id or
-        club.coordinator_id == current_user.id or
-        club.sub_coordinator_id == current_user.id or
-        current_user.role == UserRole.super_admin
-    )
-    
-    if not is_authorized:
+    if not _can_manage_announcements(club, current_user):
         raise HTTPException(status_code=403, detail="Only club admin, coordinators, or super admin can post announcements")
     
     announcement = Announcement.model_validate(announcement_in, update={"club_id": club_id})
-    db.add(announcement)
-    db.commit()
-    db.refresh(announcement)
-    
-    if twilio_client:
-        try:
-            users_to_notify = db.exec(select(User).where(User.whatsapp_verified == True, User.whatsapp_consent == True)).all()
-            message_body = (f"📢 New Announcement from *{club.name}*!\n\n"
-                            f"*{announcement.title}*\n\n{announcement.content}")
-            for user in users_to_notify:
-                if user.whatsapp_number:
-                    try:
-                        twilio_client.messages.create(
-                            from_=TWILIO_WHATSAPP_NUMBER, body=message_body,
-                            to=f"whatsapp:{user.whatsapp_number}"
-                        )
-                    except Exception as e:
-                        # Secure logging - don't expose phone numbers
-                        sanitized_phone = SecureValidator.sanitize_phone_number(user.whatsapp_number)
-                        SecureErrorHandler.log_error(e, f"WhatsApp send to {sanitized_phone}")
-        except Exception as e:
-            SecureErrorHandler.log_error(e, "WhatsApp notification process")
+    club_name = club.name
+
+    def _post(session: Session) -> Announcement:
+        session.add(announcement)
+        session.flush()
+        # Queue WhatsApp notifications in the same transaction; the dispatcher delivers them in the background
+        if notifications_enabled():
+            try:
+                numbers = session.exec(
+                    select(User.whatsapp_number).where(User.whatsapp_verified == True, User.whatsapp_consent == True)
+                ).all()
+                message_body = (f"📢 New Announcement from *{club_name}*!\n\n"
+                                f"*{announcement.title}*\n\n{announcement.content}")
+                enqueue_whatsapp(session, numbers, message_body, announcement_id=announcement.id)
+            except Exception as e:
+                SecureErrorHandler.log_error(e, "WhatsApp notification enqueue")
+        return announcement
+
+    announcement = run_write(db, _post)
+    wake_dispatcher()
 
     return announcement
 
 @router.get("/{club_id}/announcements", response_model=List[AnnouncementPublic])
-def get_club_announcements(club_id: int, db: Annotated[Session, Depends(get_session)]):
+def get_club_announcements(club_id: int, db: Annotated[Session, Depends(get_read_session)]):
     club = db.get(Club, club_id)
     if not club:
         raise HTTPException(status_code=404, detail="Club not found")
-    return sorted(club.announcements, key=lambda x: x.timestamp, reverse=True)
\ No newline at end of file
+    return sorted(club.announcements, key=lambda x: x.timestamp, reverse=True)
+
+@router.get("/{club_id}/announcements/{announcement_id}/delivery", response_model=AnnouncementDeliveryStats)
+def get_announcement_delivery_status(
+    club_id: int, announcement_id: int, db: Annotated[Session, Depends(get_read_session)],
+    current_user: Annotated[Principal, Depends(get_current_user)]
+):
+    """
+    WhatsApp delivery progress for an announcement, counted per outbox status.
+    """
+    club = db.get(Club, club_id)
+    if not club:
+        raise HTTPException(status_code=404, detail="Club not found")
+    if not _can_manage_announcements(club, current_user):
+        raise HTTPException(status_code=403, detail="Not authorized to view delivery status for this club")
+    announcement = db.get(Announcement, announcement_id)
+    if not announcement or announcement.club_id != club_id:
+        raise HTTPException(status_code=404, detail="Announcement not found")
+
+    counts = dict(db.exec(
+        select(NotificationOutbox.status, func.count(NotificationOutbox.id))
+        .where(NotificationOutbox.announcement_id == announcement_id)
+        .group_by(NotificationOutbox.status)
+    ).all())
+    return AnnouncementDeliveryStats(
+        announcement_id=announcement_id,
+        **{state.value: counts.get(state, 0) for state in NotificationStatus},
+    )
\ No newline at end of file
@@ -1,5 +1,6 @@
-from typing import List, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from typing import List, Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 from pydantic import BaseModel
 import cloudinary
@@ -7,11 +8,16 @@ import cloudinary.uploader
 
 from app.core.config import CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY, CLOUDINARY_API_SECRET
 from app.core.secure_error_handler import SecureErrorHandler, SecureValidator
-from app.db.database import get_session
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, build_page, decode_id_cursor
+from app.db.database import get_session, get_read_session, run_write
 from app.db.models import Club, Event, User, EventRegistration, EventPhoto, UserRole
 from app.api.deps import get_current_user, get_admin_or_super_admin
-from app.schemas import EventCreate, EventPublic, UserPublic
-from app.ai.recommendations import recommend_events_for_user
+from app.core.principal_cache import Principal
+from app.schemas import EventCreate, EventPublic, UserPublic, Page
+from app.ai import collaborative
+from app.ai.recommendation_cache import bump_model_version, cached_recommendations, recommendation_cache
+from app.ai.recommendations import index_new_event, load_events
+from app.ai.trending import record_registration, trending_events
 
 # Cloudinary Configuration
 cloudinary.config(
@@ -26,12 +32,15 @@ class EventPhotoPublic(BaseModel):
     id: int
     image_url: str
 
+class TrendingEventPublic(EventPublic):
+    trend_score: float
+
 # --- Photo Gallery Endpoints ---
 @router.post("/{event_id}/photos", response_model=EventPhotoPublic, status_code=status.HTTP_201_CREATED)
 def upload_photo_for_event(
     event_id: int,
     db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     file: UploadFile = File(...),
 ):
     event = db.get(Event, event_id)
@@ -74,7 +83,7 @@ def upload_photo_for_event(
     return new_photo
 
 @router.get("/{event_id}/photos", response_model=List[EventPhotoPublic])
-def get_photos_for_event(event_id: int, db: Annotated[Session, Depends(get_session)]):
+def get_photos_for_event(event_id: int, db: Annotated[Session, Depends(get_read_session)]):
     event = db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -84,7 +93,7 @@ def get_photos_for_event(event_id: int, db: Annotated[Session, Depends(get_sessi
 def delete_event_photo(
     photo_id: int,
     db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
 ):
     photo_to_delete = db.get(EventPhoto, photo_id)
     if not photo_to_delete:
@@ -118,19 +127,29 @@ def delete_event_photo(
 # --- Existing Event Endpoints ---
 @router.get("/recommendations", response_model=List[EventPublic])
 def get_event_recommendations(
-    db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user)]
+    db: Annotated[Session, Depends(get_read_session)],
+    current_user: Annotated[Principal, Depends(get_current_user)]
+):
+    # Recently active users get their recommendations pre-computed
+    recommendation_cache.touch(current_user.id)
+    return cached_recommendations(db, current_user.id)
+
+@router.get("/trending", response_model=List[TrendingEventPublic])
+def get_trending_events(
+    db: Annotated[Session, Depends(get_read_session)],
+    limit: int = Query(10, ge=1, le=50),
 ):
-    user_with_relations = db.exec(select(User).where(User.id == current_user.id)).one()
-    all_events = db.exec(select(Event)).all()
-    recommended_events = recommend_events_for_user(user_with_relations, all_events)
-    return recommended_events
+    """Upcoming events with the most recent registrations (time-decayed)"""
+    ranked = trending_events.top(db, limit)
+    scores = dict(ranked)
+    events = load_events(db, [event_id for event_id, _ in ranked])
+    return [TrendingEventPublic(**event.model_dump(), trend_score=scores[event.id]) for event in events]
 
 @router.post("/", response_model=EventPublic, status_code=status.HTTP_201_CREATED)
 def create_event(
     event_in: EventCreate, club_id: int,
     db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)]
 ):
     club = db.get(Club, club_id)
     if not club:
@@ -152,26 +171,51 @@ def create_event(
 
     event = Event.model_validate(event_in, update={"club_id": club.id})
     db.add(event)
+    # A new event can change anyone's recommendations
+    bump_model_version(db)
     db.commit()
     db.refresh(event)
+    index_new_event(event)
     return event
 
-@router.get("/", response_model=List[EventPublic])
-def get_all_events(db: Annotated[Session, Depends(get_session)]):
-    return db.exec(select(Event)).all()
+@router.get("/", response_model=Page[EventPublic])
+def get_all_events(
+    db: Annotated[Session, Depends(get_read_session)],
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    List events ordered by id. Pass the returned `next_cursor` back as
+    `cursor` to fetch the following page.
+    """
+    statement = select(Event).order_by(Event.id).limit(limit + 1)
+    last_id = decode_id_cursor(cursor)
+    if last_id is not None:
+        statement = statement.where(Event.id > last_id)
+    events = db.exec(statement).all()
+    return build_page(events, limit, key=lambda event: (event.id,))
 
 @router.get("/{event_id}", response_model=EventPublic)
-def get_event_by_id(event_id: int, db: Annotated[Session, Depends(get_session)]):
+def get_event_by_id(event_id: int, db: Annotated[Session, Depends(get_read_session)]):
     event = db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return event
 
+@router.get("/{event_id}/related", response_model=List[EventPublic])
+def get_related_events(
+    event_id: int,
+    db: Annotated[Session, Depends(get_read_session)],
+    limit: int = Query(5, ge=1, le=20),
+):
+    """Events most often attended by people who registered for this one"""
+    return load_events(db, collaborative.related_event_ids(db, collaborative.EVENT, event_id, limit))
+
 @router.post("/{event_id}/register", response_model=UserPublic)
 def register_for_event(
     event_id: int,
     db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)]
 ):
     event = db.get(Event, event_id)
     if not event:
@@ -181,7 +225,17 @@ def register_for_event(
     if existing_registration:
         raise HTTPException(status_code=400, detail="User is already registered for this event")
         
-    registration = EventRegistration(user_id=current_user.id, event_id=event_id)
-    db.add(registration)
-    db.commit()
+    user_id = current_user.id
+    event_date = event.date
+
+    def _register(session: Session) -> float:
+        session.add(EventRegistration(user_id=user_id, event_id=event_id))
+        return record_registration(session, event_id)
+
+    try:
+        log_score = run_write(db, _register)
+    except IntegrityError:
+        raise HTTPException(status_code=400, detail="User is already registered for this event")
+    trending_events.offer(event_id, log_score, event_date)
+    recommendation_cache.invalidate_user(user_id)
     return current_user
\ No newline at end of file
@@ -1,11 +1,21 @@
 from datetime import datetime
-from typing import Annotated, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Annotated, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from pydantic import BaseModel
-from sqlmodel import Session, select, func
-from app.db.database import get_session
-from app.db.models import User, Club, Event
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import FORUM_MAX_REPLY_DEPTH
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_string_cursor
+from app.db.database import get_async_session
+from app.db.forum_ranking import hot_score, refresh_hot_scores
+from app.db.forum_search import search_forums
+from app.db.like_counters import like_counter_buffer
+from app.db.models import User, Club, Event, ForumPost, ForumReply, ForumLike, ForumReplyLike
 from app.api.deps import get_current_user
+from app.core.principal_cache import Principal
+from app.schemas import Page
 
 router = APIRouter()
 
@@ -43,182 +53,306 @@ class ForumReplyResponse(BaseModel):
     parent_id: Optional[int] = None
     created_at: datetime
     likes_count: int = 0
+    depth: int = 0
+    children: List["ForumReplyResponse"] = []
 
-# In-memory storage for demo (replace with proper database models)
-forum_posts = []
-forum_replies = []
-post_likes = []
-reply_likes = []
+class ForumSearchResult(BaseModel):
+    post_id: int
+    reply_id: Optional[int] = None  # Set when the match is a reply
+    title: str
+    snippet: str  # HTML-escaped, matches wrapped in <mark>
+    score: float
+    club_id: Optional[int] = None
+    event_id: Optional[int] = None
+    category: str
+    created_at: datetime
+
+# Each path segment is a zero-padded reply id, so string order == thread order
+REPLY_PATH_WIDTH = 10
+
+def _path_segment(reply_id: int) -> str:
+    return f"{reply_id:0{REPLY_PATH_WIDTH}d}"
+
+def _subtree_end(path: str) -> str:
+    """Smallest path that sorts after every descendant of `path`"""
+    return path[:-REPLY_PATH_WIDTH] + _path_segment(int(path[-REPLY_PATH_WIDTH:]) + 1)
+
+def _post_response(post: ForumPost, author_name: str) -> ForumPostResponse:
+    response = ForumPostResponse(author_name=author_name, **post.model_dump())
+    response.likes_count += like_counter_buffer.pending(ForumPost, post.id)
+    return response
+
+def _reply_response(reply: ForumReply, author_name: str) -> ForumReplyResponse:
+    response = ForumReplyResponse(author_name=author_name, **reply.model_dump())
+    response.likes_count += like_counter_buffer.pending(ForumReply, reply.id)
+    return response
+
+async def _toggle_like(db: AsyncSession, like_model, **key) -> Tuple[bool, int]:
+    """
+    Flip the user's like row, found by primary key. Returns (liked, delta)
+    where delta is 0 if a concurrent request already made the same change.
+    """
+    if await db.get(like_model, key):
+        result = await db.exec(delete(like_model).filter_by(**key))
+        await db.commit()
+        return False, -result.rowcount
+    db.add(like_model(**key))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return True, 0
+    return True, 1
+
+async def _get_post_or_404(db: AsyncSession, post_id: int) -> ForumPost:
+    post = await db.get(ForumPost, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return post
 
 @router.get("/posts", response_model=List[ForumPostResponse])
 async def get_forum_posts(
     club_id: Optional[int] = None,
     event_id: Optional[int] = None,
     category: Optional[str] = None,
-    limit: int = 20,
-    offset: int = 0,
-    current_user: Annotated[User, Depends(get_current_user)] = None,
-    db: Annotated[Session, Depends(get_session)] = None
+    sort: Literal["new", "hot", "top"] = "new",
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: Annotated[Principal, Depends(get_current_user)] = None,
+    db: Annotated[AsyncSession, Depends(get_async_session)] = None
 ):
-    """Get forum posts with optional filtering"""
-    
-    # Filter posts based on parameters
-    filtered_posts = forum_posts.copy()
+    """
+    Get forum posts with optional filtering. `sort=new` (default) is newest
+    first, `hot` ranks by the stored hot score, `top` by likes.
+    """
     
+    # "new" with a filter is served by the (filter, created_at) composite indexes;
+    # hot and top read the stored score/count indexes instead of ranking per request
+    statement = select(ForumPost, User.full_name).join(User, User.id == ForumPost.author_id)
     if club_id:
-        filtered_posts = [p for p in filtered_posts if p.get('club_id') == club_id]
+        statement = statement.where(ForumPost.club_id == club_id)
     if event_id:
-        filtered_posts = [p for p in filtered_posts if p.get('event_id') == event_id]
+        statement = statement.where(ForumPost.event_id == event_id)
     if category:
-        filtered_posts = [p for p in filtered_posts if p.get('category') == category]
-    
-    # Sort by creation date (newest first)
-    filtered_posts.sort(key=lambda x: x.get('created_at', datetime.now()), reverse=True)
-    
-    # Apply pagination
-    paginated_posts = filtered_posts[offset:offset + limit]
-    
-    # Add reply counts
-    for post in paginated_posts:
-        post['replies_count'] = len([r for r in forum_replies if r.get('post_id') == post.get('id')])
-        post['likes_count'] = len([l for l in post_likes if l.get('post_id') == post.get('id')])
+        statement = statement.where(ForumPost.category == category)
+    if sort == "hot":
+        statement = statement.order_by(ForumPost.hot_score.desc(), ForumPost.id.desc())
+    elif sort == "top":
+        statement = statement.order_by(ForumPost.likes_count.desc(), ForumPost.id.desc())
+    else:
+        statement = statement.order_by(ForumPost.created_at.desc(), ForumPost.id.desc())
+    statement = statement.offset(offset).limit(limit)
     
-    return paginated_posts
+    rows = (await db.exec(statement)).all()
+    return [_post_response(post, author_name) for post, author_name in rows]
+
+@router.get("/search", response_model=List[ForumSearchResult])
+async def search_forum(
+    q: str = Query(..., min_length=1, max_length=200),
+    club_id: Optional[int] = None,
+    event_id: Optional[int] = None,
+    category: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current_user: Annotated[Principal, Depends(get_current_user)] = None,
+    db: Annotated[AsyncSession, Depends(get_async_session)] = None
+):
+    """Full-text search over posts and replies, best matches first"""
+    return await search_forums(
+        db, q, club_id=club_id, event_id=event_id, category=category, limit=limit, offset=offset
+    )
 
 @router.post("/posts", response_model=ForumPostResponse)
 async def create_forum_post(
     post_data: ForumPostCreate,
-    current_user: Annotated[User, Depends(get_current_user)],
-    db: Annotated[Session, Depends(get_session)]
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_async_session)]
 ):
     """Create a new forum post"""
     
     # Validate club/event exists if specified
     if post_data.club_id:
-        club = db.get(Club, post_data.club_id)
+        club = await db.get(Club, post_data.club_id)
         if not club:
             raise HTTPException(status_code=404, detail="Club not found")
     
     if post_data.event_id:
-        event = db.get(Event, post_data.event_id)
+        event = await db.get(Event, post_data.event_id)
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
     
-    # Create new post
-    new_post = {
-        'id': len(forum_posts) + 1,
-        'title': post_data.title,
-        'content': post_data.content,
-        'author_name': current_user.full_name,
-        'author_id': current_user.id,
-        'club_id': post_data.club_id,
-        'event_id': post_data.event_id,
-        'category': post_data.category,
-        'created_at': datetime.now(),
-        'replies_count': 0,
-        'likes_count': 0
-    }
-    
-    forum_posts.append(new_post)
-    return new_post
+    new_post = ForumPost.model_validate(post_data, update={"author_id": current_user.id})
+    new_post.hot_score = hot_score(0, 0, new_post.created_at)
+    db.add(new_post)
+    await db.commit()
+    return _post_response(new_post, current_user.full_name)
 
 @router.get("/posts/{post_id}", response_model=ForumPostResponse)
 async def get_forum_post(
     post_id: int,
-    current_user: Annotated[User, Depends(get_current_user)] = None
+    current_user: Annotated[Principal, Depends(get_current_user)] = None,
+    db: Annotated[AsyncSession, Depends(get_async_session)] = None
 ):
     """Get a specific forum post"""
     
-    post = next((p for p in forum_posts if p.get('id') == post_id), None)
-    if not post:
+    row = (await db.exec(
+        select(ForumPost, User.full_name)
+        .join(User, User.id == ForumPost.author_id)
+        .where(ForumPost.id == post_id)
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Post not found")
-    
-    # Add counts
-    post['replies_count'] = len([r for r in forum_replies if r.get('post_id') == post_id])
-    post['likes_count'] = len([l for l in post_likes if l.get('post_id') == post_id])
-    
-    return post
+    post, author_name = row
+    return _post_response(post, author_name)
 
-@router.get("/posts/{post_id}/replies", response_model=List[ForumReplyResponse])
+@router.get("/posts/{post_id}/replies", response_model=Page[ForumReplyResponse])
 async def get_post_replies(
     post_id: int,
-    current_user: Annotated[User, Depends(get_current_user)] = None
+    parent_id: Optional[int] = None,
+    max_depth: Optional[int] = Query(None, ge=0, le=FORUM_MAX_REPLY_DEPTH),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: Annotated[Principal, Depends(get_current_user)] = None,
+    db: Annotated[AsyncSession, Depends(get_async_session)] = None
 ):
-    """Get replies for a specific post"""
+    """
+    Get a post's replies as a tree. Pages are `limit` top-level replies (or
+    direct children of `parent_id`), each with its nested replies down to
+    `max_depth` further levels. Pass `next_cursor` back as `cursor`.
+    """
     
-    # Check if post exists
-    post = next((p for p in forum_posts if p.get('id') == post_id), None)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    await _get_post_or_404(db, post_id)
+    root_depth = 0
+    if parent_id is not None:
+        parent = await db.get(ForumReply, parent_id)
+        if not parent or parent.post_id != post_id:
+            raise HTTPException(status_code=404, detail="Parent reply not found")
+        root_depth = parent.depth + 1
     
-    # Get replies for this post
-    post_replies = [r for r in forum_replies if r.get('post_id') == post_id]
+    # The page's roots are consecutive siblings, so their subtrees form one contiguous path range
+    roots_statement = (
+        select(ForumReply.path)
+        .where(ForumReply.post_id == post_id, ForumReply.parent_id == parent_id)
+        .order_by(ForumReply.path)
+        .limit(limit + 1)
+    )
+    after_path = decode_string_cursor(cursor)
+    if after_path is not None:
+        roots_statement = roots_statement.where(ForumReply.path > after_path)
+    root_paths = (await db.exec(roots_statement)).all()
+    if not root_paths:
+        return {"items": [], "next_cursor": None}
+    has_more = len(root_paths) > limit
+    root_paths = root_paths[:limit]
     
-    # Add like counts
-    for reply in post_replies:
-        reply['likes_count'] = len([l for l in reply_likes if l.get('reply_id') == reply.get('id')])
+    statement = (
+        select(ForumReply, User.full_name)
+        .join(User, User.id == ForumReply.author_id)
+        .where(
+            ForumReply.post_id == post_id,
+            ForumReply.path >= root_paths[0],
+            ForumReply.path < _subtree_end(root_paths[-1]),
+        )
+        .order_by(ForumReply.path)
+    )
+    if max_depth is not None:
+        statement = statement.where(ForumReply.depth <= root_depth + max_depth)
+    rows = (await db.exec(statement)).all()
     
-    # Sort by creation date
-    post_replies.sort(key=lambda x: x.get('created_at', datetime.now()))
+    # Rows arrive depth-first, so every parent is seen before its children
+    nodes = {}
+    roots = []
+    for reply, author_name in rows:
+        node = _reply_response(reply, author_name)
+        nodes[reply.id] = node
+        if reply.depth == root_depth:
+            roots.append(node)
+        else:
+            nodes[reply.parent_id].children.append(node)
     
-    return post_replies
+    return {"items": roots, "next_cursor": encode_cursor(root_paths[-1]) if has_more else None}
 
 @router.post("/posts/{post_id}/replies", response_model=ForumReplyResponse)
 async def create_reply(
     post_id: int,
     reply_data: ForumReplyCreate,
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_async_session)]
 ):
     """Create a reply to a forum post"""
     
-    # Check if post exists
-    post = next((p for p in forum_posts if p.get('id') == post_id), None)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    # Create new reply
-    new_reply = {
-        'id': len(forum_replies) + 1,
-        'content': reply_data.content,
-        'author_name': current_user.full_name,
-        'author_id': current_user.id,
-        'post_id': post_id,
-        'parent_id': reply_data.parent_id,
-        'created_at': datetime.now(),
-        'likes_count': 0
-    }
+    post = await _get_post_or_404(db, post_id)
+    parent_path, depth = "", 0
+    if reply_data.parent_id is not None:
+        parent = await db.get(ForumReply, reply_data.parent_id)
+        if not parent or parent.post_id != post_id:
+            raise HTTPException(status_code=404, detail="Parent reply not found")
+        parent_path, depth = parent.path, parent.depth + 1
+        if depth > FORUM_MAX_REPLY_DEPTH:
+            raise HTTPException(status_code=400, detail="Replies cannot be nested this deeply")
     
-    forum_replies.append(new_reply)
-    return new_reply
+    new_reply = ForumReply(
+        content=reply_data.content,
+        author_id=current_user.id,
+        post_id=post_id,
+        parent_id=reply_data.parent_id,
+        depth=depth,
+    )
+    db.add(new_reply)
+    # The path ends with the reply's own id, which is only known after the insert
+    await db.flush()
+    new_reply.path = parent_path + _path_segment(new_reply.id)
+    await db.exec(
+        update(ForumPost)
+        .where(ForumPost.id == post_id)
+        .values(replies_count=ForumPost.replies_count + 1)
+    )
+    # Scored from the row as updated, which the UPDATE keeps locked, so concurrent replies cannot overwrite a newer score
+    await db.run_sync(refresh_hot_scores, [post_id])
+    await db.commit()
+    return _reply_response(new_reply, current_user.full_name)
 
 @router.post("/posts/{post_id}/like")
 async def like_post(
     post_id: int,
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_async_session)]
 ):
     """Like or unlike a forum post"""
     
-    # Check if post exists
-    post = next((p for p in forum_posts if p.get('id') == post_id), None)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
+    post = await _get_post_or_404(db, post_id)
+    # Read before toggling: a rollback on a lost race expires the post, and reloading it would need IO
+    likes_count = post.likes_count
+    liked, delta = await _toggle_like(db, ForumLike, post_id=post_id, user_id=current_user.id)
+    # likes_count itself is written in batches by the like counter buffer
+    like_counter_buffer.add(ForumPost, post_id, delta)
+    
+    return {
+        "message": "Post liked" if liked else "Post unliked",
+        "liked": liked,
+        "likes_count": likes_count + like_counter_buffer.pending(ForumPost, post_id),
+    }
+
+@router.post("/replies/{reply_id}/like")
+async def like_reply(
+    reply_id: int,
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_async_session)]
+):
+    """Like or unlike a forum reply"""
     
-    # Check if user already liked this post
-    existing_like = next((l for l in post_likes if l.get('post_id') == post_id and l.get('user_id') == current_user.id), None)
+    reply = await db.get(ForumReply, reply_id)
+    if not reply:
+        raise HTTPException(status_code=404, detail="Reply not found")
+    likes_count = reply.likes_count
+    liked, delta = await _toggle_like(db, ForumReplyLike, reply_id=reply_id, user_id=current_user.id)
+    like_counter_buffer.add(ForumReply, reply_id, delta)
     
-    if existing_like:
-        # Unlike
-        post_likes.remove(existing_like)
-        return {"message": "Post unliked", "liked": False}
-    else:
-        # Like
-        new_like = {
-            'post_id': post_id,
-            'user_id': current_user.id,
-            'created_at': datetime.now()
-        }
-        post_likes.append(new_like)
-        return {"message": "Post liked", "liked": True}
+    return {
+        "message": "Reply liked" if liked else "Reply unliked",
+        "liked": liked,
+        "likes_count": likes_count + like_counter_buffer.pending(ForumReply, reply_id),
+    }
 
 @router.get("/categories")
 async def get_forum_categories():
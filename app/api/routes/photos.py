@@ -1,5 +1,7 @@
 from typing import List, Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Query
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
 from pydantic import BaseModel
 from datetime import datetime
@@ -8,14 +10,30 @@ import cloudinary.uploader
 
 from app.core.cloudinary_utils import upload_to_cloudinary
 from app.core.secure_error_handler import SecureErrorHandler, SecureValidator
-from app.db.database import get_session
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, build_page, decode_timestamp_cursor
+from app.db.database import get_session, get_read_session
 from app.db.models import EventPhoto, GalleryPhoto, User, UserRole, Event
 from app.api.deps import get_current_user, get_super_admin
-from app.schemas import EventPhotoPublic, GalleryPhotoPublic # Import the new schema
+from app.core.principal_cache import Principal
+from app.schemas import EventPhotoPublic, GalleryPhotoPublic, Page # Import the new schema
 from app.core.cloudinary_utils import upload_to_cloudinary # Import the Cloudinary helper
 
 router = APIRouter()
 
+def _after_timestamp_cursor(model, cursor: Optional[str]):
+    """
+    Keyset condition for rows strictly after (timestamp, id) in newest-first order.
+    Bounding on `timestamp <=` first lets the timestamp index drive the range scan.
+    """
+    key = decode_timestamp_cursor(cursor)
+    if key is None:
+        return None
+    last_timestamp, last_id = key
+    return and_(
+        model.timestamp <= last_timestamp,
+        or_(model.timestamp < last_timestamp, model.id < last_id),
+    )
+
 # ===============================================================
 # === EVENT-SPECIFIC PHOTOS (Existing Endpoints) ==============
 # ===============================================================
@@ -30,22 +48,34 @@ class PhotoWithDetails(BaseModel):
     timestamp: datetime
     event: EventInfo
 
-@router.get("/", response_model=List[PhotoWithDetails], summary="Get All Event Photos")
+@router.get("/", response_model=Page[PhotoWithDetails], summary="Get All Event Photos")
 def get_all_photos(
-    db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_read_session)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
 ):
     """
-    Get all photos from all specific club events, sorted by most recent.
+    Get a page of photos from all club events, sorted by most recent.
+    Pass the returned `next_cursor` back as `cursor` for the next page.
     """
-    photos = db.exec(select(EventPhoto).order_by(EventPhoto.timestamp.desc())).all()
-    return photos
+    statement = (
+        select(EventPhoto)
+        .options(selectinload(EventPhoto.event))
+        .order_by(EventPhoto.timestamp.desc(), EventPhoto.id.desc())
+        .limit(limit + 1)
+    )
+    condition = _after_timestamp_cursor(EventPhoto, cursor)
+    if condition is not None:
+        statement = statement.where(condition)
+    photos = db.exec(statement).all()
+    return build_page(photos, limit, key=lambda photo: (photo.timestamp, photo.id))
 
 @router.delete("/{photo_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete an Event Photo")
 def delete_photo(
     photo_id: int,
     db: Annotated[Session, Depends(get_session)],
-    super_admin: Annotated[User, Depends(get_super_admin)],
+    super_admin: Annotated[Principal, Depends(get_super_admin)],
 ):
     """
     Delete a photo by its ID from a specific event. (Super Admin only)
@@ -70,7 +100,7 @@ def delete_photo(
 @router.post("/gallery", response_model=GalleryPhotoPublic, status_code=status.HTTP_201_CREATED, summary="Upload to Common Gallery")
 def upload_to_gallery(
     db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     file: UploadFile = File(..., description="The photo to upload."),
     caption: Optional[str] = Form(None, description="An optional caption for the photo.")
 ):
@@ -87,7 +117,7 @@ def upload_to_gallery(
         image_url=upload_result['secure_url'],
         public_id=upload_result['public_id'],
         caption=caption,
-        uploader=current_user
+        uploaded_by_id=current_user.id
     )
     
     db.add(new_photo)
@@ -96,21 +126,33 @@ def upload_to_gallery(
     
     return new_photo
 
-@router.get("/gallery", response_model=List[GalleryPhotoPublic], summary="Get All Common Gallery Photos")
+@router.get("/gallery", response_model=Page[GalleryPhotoPublic], summary="Get All Common Gallery Photos")
 def get_common_gallery_photos(
-    db: Annotated[Session, Depends(get_session)]
+    db: Annotated[Session, Depends(get_read_session)],
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
 ):
     """
-    Get all photos from the common gallery, available to all users.
+    Get a page of photos from the common gallery, available to all users.
+    Pass the returned `next_cursor` back as `cursor` for the next page.
     """
-    photos = db.exec(select(GalleryPhoto).order_by(GalleryPhoto.timestamp.desc())).all()
-    return photos
+    statement = (
+        select(GalleryPhoto)
+        .options(selectinload(GalleryPhoto.uploader))
+        .order_by(GalleryPhoto.timestamp.desc(), GalleryPhoto.id.desc())
+        .limit(limit + 1)
+    )
+    condition = _after_timestamp_cursor(GalleryPhoto, cursor)
+    if condition is not None:
+        statement = statement.where(condition)
+    photos = db.exec(statement).all()
+    return build_page(photos, limit, key=lambda photo: (photo.timestamp, photo.id))
 
 @router.delete("/gallery/{photo_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Delete a Common Gallery Photo")
 def delete_gallery_photo(
     photo_id: int,
     db: Annotated[Session, Depends(get_session)],
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
 ):
     """
     Delete a photo from the common gallery.
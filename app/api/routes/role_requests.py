@@ -7,6 +7,7 @@ from datetime import datetime
 from app.db.database import get_session
 from app.db.models import User, UserRole, RoleRequest, RoleRequestStatus
 from app.api.deps import get_current_user
+from app.core.principal_cache import Principal, invalidate_user
 from app.schemas import UserPublic
 
 # --- Schemas ---
@@ -38,7 +39,7 @@ router = APIRouter()
 @router.post("/request-role", response_model=dict)
 def request_role_upgrade(
     request_data: RoleRequestCreate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_session)]
 ):
     """Allow students to request role upgrades to club_admin"""
@@ -103,7 +104,7 @@ def request_role_upgrade(
 
 @router.get("/my-requests", response_model=List[RoleRequestResponse])
 def get_my_role_requests(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_session)]
 ):
     """Get current user's role requests"""
@@ -139,7 +140,7 @@ def get_my_role_requests(
 
 @router.get("/all-requests", response_model=List[RoleRequestResponse])
 def get_all_role_requests(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_session)]
 ):
     """Get all role requests - only for super admins"""
@@ -181,7 +182,7 @@ def get_all_role_requests(
 
 @router.get("/pending-requests", response_model=List[RoleRequestResponse])
 def get_pending_role_requests(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_session)]
 ):
     """Get pending role requests - only for super admins"""
@@ -222,7 +223,7 @@ def get_pending_role_requests(
 def review_role_request(
     request_id: int,
     review_data: RoleRequestReview,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_session)]
 ):
     """Review a role request - only for super admins"""
@@ -260,14 +261,17 @@ def review_role_request(
     role_request.admin_notes = review_data.admin_notes
     
     # If approved, update the user's role
+    promoted_user = None
     if review_data.status == RoleRequestStatus.approved:
-        user = db.get(User, role_request.user_id)
-        if user:
-            user.role = role_request.requested_role
-            db.add(user)
+        promoted_user = db.get(User, role_request.user_id)
+        if promoted_user:
+            promoted_user.role = role_request.requested_role
+            db.add(promoted_user)
     
     db.add(role_request)
     db.commit()
+    if promoted_user:
+        invalidate_user(promoted_user)
     
     action = "approved" if review_data.status == RoleRequestStatus.approved else "rejected"
     return {
@@ -279,7 +283,7 @@ def review_role_request(
 @router.delete("/cancel-request/{request_id}", response_model=dict)
 def cancel_role_request(
     request_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_session)]
 ):
     """Cancel a pending role request - only the requester can cancel their own request"""
@@ -1,20 +1,21 @@
 from typing import List, Annotated
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 from pydantic import BaseModel
-# import face_recognition  # Temporarily disabled for deployment
-# import numpy as np  # Temporarily disabled for deployment
-import io
-from PIL import Image
 import requests
 
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.ai.face_encodings import decode_image, encode_faces, encoding_to_bytes, face_recognition_available
+from app.ai.face_index import face_index, bump_face_index_version
+
+from app.core.security import get_password_hash, verify_password_and_update, create_access_token, UNUSABLE_PASSWORD
 from app.core.super_admin_config import is_super_admin_email, log_super_admin_attempt
 from app.core.secure_error_handler import SecureErrorHandler, SecureValidator
-from app.db.database import get_session
+from app.db.database import get_session, run_write
 from app.db.models import User, UserRole, Club
 from app.api.deps import get_current_user
+from app.core.principal_cache import Principal
 from app.schemas import UserPublic, ClubPublic, UserPublicWithDetails, ClubAdminView
 
 def get_user_role_by_email(email: str) -> UserRole:
@@ -68,10 +69,16 @@ def create_user(user_in: UserCreate, db: Annotated[Session, Depends(get_session)
         "hashed_password": get_password_hash(user_in.password),
         "role": assigned_role  # Super Admin for whitelisted emails, Student for others
     })
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+
+    def _insert_user(session: Session) -> User:
+        session.add(user)
+        return user
+
+    try:
+        return run_write(db, _insert_user)
+    except IntegrityError:
+        # Lost a race with a concurrent signup for the same email
+        raise HTTPException(status_code=400, detail="User with this email already exists")
 
 @router.post("/login", response_model=Token)
 def login_for_access_token(
@@ -81,12 +88,27 @@ def login_for_access_token(
     # Email domain restriction removed - now accepts all email domains
     
     user = db.exec(select(User).where(User.email == form_data.username)).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    is_valid, new_hash = verify_password_and_update(form_data.password, user.hashed_password) if user else (False, None)
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored hash uses an outdated bcrypt cost; upgrade it now that we know the password
+        user_id = user.id
+
+        def _rehash(session: Session) -> None:
+            stored_user = session.get(User, user_id)
+            if stored_user:
+                stored_user.hashed_password = new_hash
+                session.add(stored_user)
+
+        try:
+            run_write(db, _rehash)
+        except Exception as e:
+            SecureErrorHandler.log_error(e, "Password rehash on login", user_id)
     access_token = create_access_token(data={"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -135,7 +157,7 @@ def google_login(request: GoogleLoginRequest, db: Annotated[Session, Depends(get
             user = User(
                 email=email,
                 full_name=name or email.split("@")[0],
-                hashed_password=get_password_hash("google_oauth_user"),  # Placeholder password
+                hashed_password=UNUSABLE_PASSWORD,  # Google-only account, password login disabled
                 role=assigned_role,  # Super Admin for whitelisted emails, Student for others
                 whatsapp_number="",  # Empty for Google users
                 whatsapp_consent=False
@@ -162,15 +184,25 @@ def google_login(request: GoogleLoginRequest, db: Annotated[Session, Depends(get
         )
 
 @router.get("/me", response_model=UserPublicWithDetails)
-def read_users_me(current_user: Annotated[User, Depends(get_current_user)]):
-    return current_user
+def read_users_me(
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_session)],
+):
+    user = db.get(User, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 @router.get("/me/administered-clubs", response_model=List[ClubAdminView])
 def get_my_administered_clubs(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_session)],
 ):
+    user = db.get(User, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     clubs_with_counts = []
-    for club in current_user.administered_clubs:
+    for club in user.administered_clubs:
         club_view = ClubAdminView(
             id=club.id, name=club.name, description=club.description,
             admin_id=club.admin_id, admin=club.admin,
@@ -179,41 +211,41 @@ def get_my_administered_clubs(
         clubs_with_counts.append(club_view)
     return clubs_with_counts
 
-# Face enrollment temporarily disabled for deployment
-# @router.post("/me/enroll-face", response_model=UserPublic)
-# async def enroll_user_face(
-#     current_user: Annotated[User, Depends(get_current_user)],
-#     db: Annotated[Session, Depends(get_session)],
-#     file: UploadFile = File(...),
-# ):
-#     try:
-#         # Validate file first
-#         SecureValidator.validate_file_upload(file)
-#         
-#         contents = await file.read()
-#         image = Image.open(io.BytesIO(contents)).convert("RGB")
-#         image_np = np.array(image)
-#     except HTTPException:
-#         # Re-raise validation errors
-#         raise
-#     except Exception as e:
-#         raise SecureErrorHandler.handle_validation_error("image", "Invalid image file format")
-
-#     face_locations = face_recognition.face_locations(image_np)
-#     if not face_locations:
-#         raise HTTPException(status_code=400, detail="No face found in the image.")
-#     if len(face_locations) > 1:
-#         raise HTTPException(status_code=400, detail="Multiple faces found. Please upload an image with only one face.")
-    
-#     face_encoding = face_recognition.face_encodings(image_np, known_face_locations=face_locations)[0]
-#     encoding_str = ",".join(map(str, face_encoding))
+@router.post("/me/enroll-face", response_model=UserPublic)
+def enroll_user_face(
+    current_user: Annotated[Principal, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_session)],
+    file: UploadFile = File(...),
+):
+    if not face_recognition_available():
+        raise HTTPException(status_code=503, detail="Face recognition is not available on this server.")
+    try:
+        # Validate file first
+        SecureValidator.validate_file_upload(file)
+        
+        contents = file.file.read()
+        image_np = decode_image(contents)
+    except HTTPException:
+        # Re-raise validation errors
+        raise
+    except Exception as e:
+        raise SecureErrorHandler.handle_validation_error("image", "Invalid image file format")
+
+    face_encodings = encode_faces(image_np)
+    if not face_encodings:
+        raise HTTPException(status_code=400, detail="No face found in the image.")
+    if len(face_encodings) > 1:
+        raise HTTPException(status_code=400, detail="Multiple faces found. Please upload an image with only one face.")
     
-#     user_to_update = db.get(User, current_user.id)
-#     if not user_to_update:
-#         raise HTTPException(status_code=404, detail="User not found")
+    user_to_update = db.get(User, current_user.id)
+    if not user_to_update:
+        raise HTTPException(status_code=404, detail="User not found")
         
-#     user_to_update.face_encoding = encoding_str
-#     db.add(user_to_update)
-#     db.commit()
-#     db.refresh(user_to_update)
-#     return user_to_update
\ No newline at end of file
+    user_to_update.face_embedding = encoding_to_bytes(face_encodings[0])
+    db.add(user_to_update)
+    version = bump_face_index_version(db)
+    db.commit()
+    db.refresh(user_to_update)
+    face_index.add(user_to_update.id, face_encodings[0])
+    face_index.applied(version)
+    return user_to_update
\ No newline at end of file
@@ -11,6 +11,7 @@ from app.core.secure_error_handler import SecureErrorHandler, SecureValidator
 from app.db.database import get_session
 from app.db.models import User
 from app.api.deps import get_current_user
+from app.core.principal_cache import Principal
 
 router = APIRouter()
 
@@ -74,7 +75,7 @@ def send_otp(payload: PhonePayload, db: Annotated[Session, Depends(get_session)]
 @router.post("/verify-otp", status_code=status.HTTP_200_OK)
 def verify_otp(
     payload: OTPPayload,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_session)]
 ):
     user = db.get(User, current_user.id)
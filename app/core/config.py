@@ -4,12 +4,97 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Database and JWT Config
-# Use SQLite for now - will switch to PostgreSQL later
-DATABASE_URL = "sqlite:///./samvad.db"
+# SQLite by default for local development; set DATABASE_URL for PostgreSQL in production
+def _normalize_db_url(url):
+    if url and url.startswith("postgres://"):
+        # Render and Heroku hand out postgres:// URLs, which SQLAlchemy no longer accepts
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+DATABASE_URL = _normalize_db_url(os.getenv("DATABASE_URL", "sqlite:///./samvad.db"))
+
+# Optional read replica for GET endpoints. After a user writes, their reads stay
+# on the primary for READ_YOUR_WRITES_SECONDS so they see their own changes.
+DATABASE_REPLICA_URL = _normalize_db_url(os.getenv("DATABASE_REPLICA_URL"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+
+# Connection pool tuning (per worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# SQLite profile: pragmas applied on every connection, plus a single-writer queue
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -64000))  # negative = KiB, so ~64MB
+SQLITE_WRITE_QUEUE = os.getenv("SQLITE_WRITE_QUEUE", "true").lower() == "true"
+
+# Statement logging is only honoured in debug mode
+DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+SQL_ECHO = DEBUG and os.getenv("SQL_ECHO", "false").lower() == "true"
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-super-secret-jwt-key-change-this-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+# Password hashing: bcrypt cost and the dedicated process pool that runs it.
+# Changing BCRYPT_ROUNDS is safe: existing hashes are upgraded on next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+# Each pending operation holds a request thread (anyio's default is 40), so keep this well below that
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 8))
+PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", 10))
+
+# Authenticated-principal cache used by get_current_user
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+# Forums: deepest reply nesting accepted (top-level replies are depth 0)
+FORUM_MAX_REPLY_DEPTH = int(os.getenv("FORUM_MAX_REPLY_DEPTH", 8))
+# How often buffered like/unlike deltas are written to likes_count
+FORUM_LIKE_FLUSH_INTERVAL_MS = int(os.getenv("FORUM_LIKE_FLUSH_INTERVAL_MS", 250))
+# Hot feed: how often time decay is re-applied, and how long a post can stay "hot"
+FORUM_HOT_SWEEP_INTERVAL_SECONDS = int(os.getenv("FORUM_HOT_SWEEP_INTERVAL_SECONDS", 300))
+FORUM_HOT_WINDOW_DAYS = int(os.getenv("FORUM_HOT_WINDOW_DAYS", 7))
+
+# Per-user cache for GET /events/recommendations, warmed for recently active users
+RECOMMENDATION_CACHE_TTL_SECONDS = int(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", 900))
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", 10000))
+RECOMMENDATION_WARM_INTERVAL_SECONDS = int(os.getenv("RECOMMENDATION_WARM_INTERVAL_SECONDS", 60))
+RECOMMENDATION_ACTIVE_WINDOW_SECONDS = int(os.getenv("RECOMMENDATION_ACTIVE_WINDOW_SECONDS", 1800))
+
+# Trending events: registrations lose half their weight every TRENDING_HALF_LIFE_HOURS
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 24))
+TRENDING_TOP_K = int(os.getenv("TRENDING_TOP_K", 50))
+
+# Face attendance: largest encoding distance accepted as a match, and the enrolled
+# count above which the face index switches from a full scan to probing k-means cells
+FACE_MATCH_TOLERANCE = float(os.getenv("FACE_MATCH_TOLERANCE", 0.5))
+FACE_INDEX_PARTITION_THRESHOLD = int(os.getenv("FACE_INDEX_PARTITION_THRESHOLD", 50000))
+FACE_INDEX_PROBES = int(os.getenv("FACE_INDEX_PROBES", 8))
+# Attendance frames are decoded and encoded in this many worker processes, after
+# being scaled down so neither side is wider than FACE_FRAME_MAX_SIZE pixels
+FACE_FRAME_WORKERS = int(os.getenv("FACE_FRAME_WORKERS", 2))
+FACE_FRAME_MAX_SIZE = int(os.getenv("FACE_FRAME_MAX_SIZE", 640))
+# Bulk face enrollment: worker processes, image downscale limit, largest accepted zip,
+# and the only server directory (and its subdirectories) that imports may read from
+FACE_ENROLL_WORKERS = int(os.getenv("FACE_ENROLL_WORKERS", 2))
+FACE_ENROLL_MAX_SIZE = int(os.getenv("FACE_ENROLL_MAX_SIZE", 1024))
+FACE_ENROLL_MAX_ARCHIVE_MB = int(os.getenv("FACE_ENROLL_MAX_ARCHIVE_MB", 500))
+FACE_ENROLL_IMPORT_DIR = os.getenv("FACE_ENROLL_IMPORT_DIR")
+
+# Attendance rows are buffered and inserted in bulk every ATTENDANCE_FLUSH_INTERVAL_MS,
+# or as soon as ATTENDANCE_FLUSH_BATCH_SIZE are waiting
+ATTENDANCE_FLUSH_INTERVAL_MS = int(os.getenv("ATTENDANCE_FLUSH_INTERVAL_MS", 200))
+ATTENDANCE_FLUSH_BATCH_SIZE = int(os.getenv("ATTENDANCE_FLUSH_BATCH_SIZE", 100))
+
+# QR check-in: signing key (derived from JWT_SECRET_KEY when unset), token lifetime,
+# and how many used tokens each worker remembers to reject replays
+QR_TOKEN_SECRET = os.getenv("QR_TOKEN_SECRET")
+QR_TOKEN_TTL_SECONDS = int(os.getenv("QR_TOKEN_TTL_SECONDS", 120))
+QR_REPLAY_CACHE_SIZE = int(os.getenv("QR_REPLAY_CACHE_SIZE", 100000))
+
 # Cloudinary Config
 CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
 CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY")
@@ -19,3 +104,10 @@ CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_WHATSAPP_NUMBER = os.getenv("TWILIO_WHATSAPP_NUMBER")
+
+# WhatsApp notification outbox
+# NOTIFICATION_TRANSPORT: "twilio" for real delivery, "stub" to exercise the dispatcher offline
+NOTIFICATION_TRANSPORT = os.getenv("NOTIFICATION_TRANSPORT", "twilio")
+NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", 8))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", 5))
+TWILIO_MAX_MESSAGES_PER_SECOND = float(os.getenv("TWILIO_MAX_MESSAGES_PER_SECOND", 20))
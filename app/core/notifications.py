@@ -0,0 +1,343 @@
+"""
+WhatsApp notification outbox for SAMVAD.
+Announcements only insert NotificationOutbox rows; a background dispatcher
+claims them in batches and delivers them through a bounded worker pool,
+throttled to the Twilio sending rate and retried with exponential backoff.
+"""
+
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select
+
+from app.core.config import (
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_TRANSPORT,
+    NOTIFICATION_WORKERS,
+    TWILIO_ACCOUNT_SID,
+    TWILIO_AUTH_TOKEN,
+    TWILIO_MAX_MESSAGES_PER_SECOND,
+    TWILIO_WHATSAPP_NUMBER,
+)
+from app.core.secure_error_handler import SecureErrorHandler, SecureValidator
+from app.db.models import NotificationOutbox, NotificationStatus
+
+
+# --- Transports ---
+
+class TransportError(Exception):
+    """Delivery failure reported by a transport"""
+
+    def __init__(self, message: str, retryable: bool = True, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class TwilioTransport:
+    """Sends WhatsApp messages through the Twilio REST API"""
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str):
+        from twilio.rest import Client
+
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+
+    def send(self, to_number: str, body: str) -> str:
+        from twilio.base.exceptions import TwilioRestException
+
+        try:
+            message = self.client.messages.create(
+                from_=self.from_number, body=body, to=f"whatsapp:{to_number}"
+            )
+        except TwilioRestException as e:
+            if e.status == 429:
+                raise TransportError("Twilio rate limit exceeded", retryable=True, retry_after=1.0)
+            # 4xx other than 429 (invalid number, unverified recipient, ...) will not succeed on retry
+            raise TransportError(f"Twilio error {e.code}", retryable=e.status >= 500)
+        except Exception as e:
+            raise TransportError(type(e).__name__, retryable=True)
+        return message.sid
+
+
+class StubTransport:
+    """
+    Offline stand-in for Twilio, used for local development and benchmarks.
+    Simulates network latency and an optional random failure rate.
+    """
+
+    def __init__(self, latency: float = 0.05, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def send(self, to_number: str, body: str) -> str:
+        time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise TransportError("Simulated failure", retryable=True)
+        with self._lock:
+            self.sent += 1
+            return f"stub-{self.sent}"
+
+
+# --- Throttling ---
+
+class RateLimiter:
+    """Thread-safe token bucket; `pause` empties it after a provider 429"""
+
+    def __init__(self, rate_per_second: float):
+        self.rate = rate_per_second
+        self.tokens = rate_per_second
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+# --- Dispatcher ---
+
+SendResult = Tuple[int, Optional[str], Optional[TransportError]]
+
+
+class NotificationDispatcher:
+    """Claims pending outbox rows and delivers them with bounded concurrency"""
+
+    def __init__(
+        self,
+        transport,
+        session_factory: Callable[[], Session],
+        workers: int = NOTIFICATION_WORKERS,
+        rate_per_second: float = TWILIO_MAX_MESSAGES_PER_SECOND,
+        max_attempts: int = NOTIFICATION_MAX_ATTEMPTS,
+        batch_size: Optional[int] = None,
+        poll_interval: float = 2.0,
+        base_backoff: float = 5.0,
+        lease_seconds: float = 300.0,
+    ):
+        self.transport = transport
+        self.session_factory = session_factory
+        self.workers = workers
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size or workers * 4
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self.lease_seconds = lease_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="notify")
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._thread = None
+        self._executor = None
+
+    def wake(self) -> None:
+        """Start a dispatch pass now instead of waiting for the next poll"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                SecureErrorHandler.log_error(e, "WhatsApp notification dispatcher")
+                processed = 0
+            if not processed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_once(self) -> int:
+        """Claim, send and record one batch. Returns the number of rows processed."""
+        claimed = self._claim()
+        if not claimed:
+            return 0
+        if self._executor:
+            results = list(self._executor.map(self._send, claimed))
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(self._send, claimed))
+        self._record(results)
+        return len(results)
+
+    def drain(self) -> int:
+        """Process batches until nothing is due. Returns the total processed."""
+        total = 0
+        while True:
+            processed = self.run_once()
+            if not processed:
+                return total
+            total += processed
+
+    def _claim(self) -> List[Tuple[int, str, str]]:
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        due = or_(
+            NotificationOutbox.status == NotificationStatus.pending,
+            # Lease expired: the process that claimed this row died mid-send
+            NotificationOutbox.status == NotificationStatus.sending,
+        )
+        with self.session_factory() as session:
+            candidates = (
+                select(NotificationOutbox.id)
+                .where(due, NotificationOutbox.next_attempt_at <= now)
+                .order_by(NotificationOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .scalar_subquery()
+            )
+            # One conditional UPDATE claims the batch atomically, so several
+            # workers polling the same table never send a row twice.
+            session.exec(
+                update(NotificationOutbox)
+                .where(
+                    NotificationOutbox.id.in_(candidates),
+                    and_(due, NotificationOutbox.next_attempt_at <= now),
+                )
+                .values(
+                    status=NotificationStatus.sending,
+                    claim_token=token,
+                    next_attempt_at=now + timedelta(seconds=self.lease_seconds),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            rows = session.exec(
+                select(NotificationOutbox.id, NotificationOutbox.to_number, NotificationOutbox.body)
+                .where(NotificationOutbox.claim_token == token)
+            ).all()
+        return [tuple(row) for row in rows]
+
+    def _send(self, item: Tuple[int, str, str]) -> SendResult:
+        outbox_id, to_number, body = item
+        self.rate_limiter.acquire()
+        try:
+            return outbox_id, self.transport.send(to_number, body), None
+        except TransportError as e:
+            if e.retry_after:
+                self.rate_limiter.pause(e.retry_after)
+            return outbox_id, None, e
+        except Exception as e:
+            return outbox_id, None, TransportError(type(e).__name__, retryable=True)
+
+    def _record(self, results: Iterable[SendResult]) -> None:
+        now = datetime.utcnow()
+        with self.session_factory() as session:
+            for outbox_id, provider_id, error in results:
+                row = session.get(NotificationOutbox, outbox_id)
+                if row is None:
+                    continue
+                row.attempts += 1
+                row.claim_token = None
+                if error is None:
+                    row.status = NotificationStatus.sent
+                    row.provider_message_id = provider_id
+                    row.sent_at = now
+                    row.last_error = None
+                elif error.retryable and row.attempts < self.max_attempts:
+                    backoff = self.base_backoff * (2 ** (row.attempts - 1))
+                    row.status = NotificationStatus.pending
+                    row.next_attempt_at = now + timedelta(seconds=backoff * random.uniform(0.8, 1.2))
+                    row.last_error = str(error)[:1000]
+                else:
+                    row.status = NotificationStatus.failed
+                    row.last_error = str(error)[:1000]
+                    sanitized_phone = SecureValidator.sanitize_phone_number(row.to_number)
+                    SecureErrorHandler.log_error(error, f"WhatsApp send to {sanitized_phone}")
+                session.add(row)
+            session.commit()
+
+
+# --- Module-level dispatcher used by the app ---
+
+def create_transport():
+    """Build the transport selected by NOTIFICATION_TRANSPORT, or None if unavailable"""
+    if NOTIFICATION_TRANSPORT == "stub":
+        return StubTransport()
+    if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN and TWILIO_WHATSAPP_NUMBER:
+        try:
+            return TwilioTransport(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_WHATSAPP_NUMBER)
+        except Exception as e:
+            SecureErrorHandler.log_error(e, "Twilio client initialization")
+    return None
+
+
+dispatcher: Optional[NotificationDispatcher] = None
+
+
+def start_dispatcher(session_factory: Callable[[], Session]) -> None:
+    global dispatcher
+    transport = create_transport()
+    if transport is None:
+        return
+    dispatcher = NotificationDispatcher(transport, session_factory)
+    dispatcher.start()
+
+
+def stop_dispatcher() -> None:
+    if dispatcher:
+        dispatcher.stop()
+
+
+def notifications_enabled() -> bool:
+    return dispatcher is not None
+
+
+def enqueue_whatsapp(
+    db: Session, to_numbers: Iterable[str], body: str, announcement_id: Optional[int] = None
+) -> int:
+    """
+    Add one outbox row per recipient to the caller's session.
+    The caller commits, then calls `wake_dispatcher`.
+    """
+    rows = [
+        NotificationOutbox(to_number=number, body=body, announcement_id=announcement_id)
+        for number in to_numbers
+        if number
+    ]
+    db.add_all(rows)
+    return len(rows)
+
+
+def wake_dispatcher() -> None:
+    if dispatcher:
+        dispatcher.wake()
@@ -0,0 +1,78 @@
+"""
+Keyset (cursor) pagination helpers for SAMVAD list endpoints.
+Cursors are opaque to clients: a URL-safe base64 encoding of the sort key
+of the last row on the previous page.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from app.core.secure_error_handler import SecureErrorHandler
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode a sort key (e.g. id, or timestamp + id) into an opaque cursor"""
+    key = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise SecureErrorHandler.handle_validation_error("cursor")
+    if not isinstance(key, list):
+        raise SecureErrorHandler.handle_validation_error("cursor")
+    return key
+
+
+def decode_id_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Decode a cursor produced by ``encode_cursor(id)``"""
+    if cursor is None:
+        return None
+    key = _decode(cursor)
+    if len(key) != 1 or not isinstance(key[0], int):
+        raise SecureErrorHandler.handle_validation_error("cursor")
+    return key[0]
+
+
+def decode_timestamp_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Decode a cursor produced by ``encode_cursor(timestamp, id)``"""
+    if cursor is None:
+        return None
+    key = _decode(cursor)
+    if len(key) != 2 or not isinstance(key[0], str) or not isinstance(key[1], int):
+        raise SecureErrorHandler.handle_validation_error("cursor")
+    try:
+        return datetime.fromisoformat(key[0]), key[1]
+    except ValueError:
+        raise SecureErrorHandler.handle_validation_error("cursor")
+
+
+def decode_string_cursor(cursor: Optional[str]) -> Optional[str]:
+    """Decode a cursor produced by ``encode_cursor(text_key)``"""
+    if cursor is None:
+        return None
+    key = _decode(cursor)
+    if len(key) != 1 or not isinstance(key[0], str):
+        raise SecureErrorHandler.handle_validation_error("cursor")
+    return key[0]
+
+
+def build_page(rows: List[Any], limit: int, key) -> dict:
+    """
+    Build a page response from ``limit + 1`` fetched rows.
+    The extra row only signals that another page exists; it is not returned.
+    """
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = encode_cursor(*key(items[-1]))
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,79 @@
+"""
+In-process cache of authenticated principals.
+get_current_user runs on nearly every request; caching the resolved user
+(keyed by the token subject) saves the per-request user lookup. Entries
+expire after AUTH_CACHE_TTL_SECONDS and are dropped explicitly when a
+user's role changes or the user is deleted. The cache is per worker, so
+other workers may serve a stale role for at most one TTL.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from cachetools import TTLCache
+
+from app.core.config import AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS
+from app.db.models import User, UserRole
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as seen by route handlers"""
+    id: int
+    email: str
+    full_name: str
+    role: UserRole
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, email=user.email, full_name=user.full_name, role=user.role)
+
+
+class PrincipalCache:
+    def __init__(self, ttl: float = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self._cache: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subject: str) -> Optional[Principal]:
+        with self._lock:
+            principal = self._cache.get(subject)
+            if principal is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return principal
+
+    def set(self, subject: str, principal: Principal) -> None:
+        with self._lock:
+            self._cache[subject] = principal
+
+    def invalidate(self, subject: str) -> None:
+        with self._lock:
+            self._cache.pop(subject, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._cache),
+                "max_entries": int(self._cache.maxsize),
+                "ttl_seconds": self._cache.ttl,
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+def invalidate_user(user: User) -> None:
+    """Drop a user's cached principal after their role or account changes"""
+    principal_cache.invalidate(user.email)
@@ -0,0 +1,104 @@
+"""
+Signed QR check-in tokens.
+A token names one user and one event, expires QR_TOKEN_TTL_SECONDS after
+it is issued and carries a random nonce. It is the packed fields plus a
+truncated HMAC-SHA256, base64url encoded, so verifying it is a hash and a
+comparison with no database read.
+
+Each worker remembers the nonces of tokens it has accepted until they
+expire, in a cache bounded by QR_REPLAY_CACHE_SIZE, and rejects a second
+use. The cache is per worker; a token replayed on another worker still
+cannot mark anyone twice, because attendance is unique per user, event
+and day.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from cachetools import TTLCache
+
+from app.core.config import JWT_SECRET_KEY, QR_TOKEN_SECRET, QR_TOKEN_TTL_SECONDS, QR_REPLAY_CACHE_SIZE
+
+_PAYLOAD = struct.Struct(">QQI8s")  # user id, event id, expiry (unix seconds), nonce
+_MAC_BYTES = 16
+
+
+def _default_key() -> bytes:
+    # A separate key from the JWT one, so a QR token can never pass as an access token or the reverse
+    return hmac.new(JWT_SECRET_KEY.encode(), b"samvad-qr-check-in", hashlib.sha256).digest()
+
+
+_KEY = QR_TOKEN_SECRET.encode() if QR_TOKEN_SECRET else _default_key()
+
+
+class InvalidQRToken(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class QRToken:
+    user_id: int
+    event_id: int
+    expires_at: int
+    nonce: bytes
+
+
+def _mac(payload: bytes) -> bytes:
+    return hmac.new(_KEY, payload, hashlib.sha256).digest()[:_MAC_BYTES]
+
+
+def issue_token(user_id: int, event_id: int, ttl: int = QR_TOKEN_TTL_SECONDS) -> Tuple[str, int]:
+    """A check-in token for a user at an event, and its expiry as unix seconds"""
+    expires_at = int(time.time()) + ttl
+    payload = _PAYLOAD.pack(user_id, event_id, expires_at, os.urandom(8))
+    return base64.urlsafe_b64encode(payload + _mac(payload)).rstrip(b"=").decode(), expires_at
+
+
+def verify_token(token: str, event_id: int, now: Optional[float] = None) -> QRToken:
+    """Check signature, event and expiry; raises InvalidQRToken with a short reason"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        raise InvalidQRToken("malformed") from None
+    if len(raw) != _PAYLOAD.size + _MAC_BYTES:
+        raise InvalidQRToken("malformed")
+    payload, mac = raw[:_PAYLOAD.size], raw[_PAYLOAD.size:]
+    if not hmac.compare_digest(mac, _mac(payload)):
+        raise InvalidQRToken("bad signature")
+    parsed = QRToken(*_PAYLOAD.unpack(payload))
+    if parsed.event_id != event_id:
+        raise InvalidQRToken("wrong event")
+    if parsed.expires_at < (now or time.time()):
+        raise InvalidQRToken("expired")
+    return parsed
+
+
+class ReplayCache:
+    """Nonces of accepted tokens, kept until the tokens expire"""
+
+    def __init__(self, max_entries: int = QR_REPLAY_CACHE_SIZE, ttl: int = QR_TOKEN_TTL_SECONDS):
+        self._seen: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def first_use(self, token: QRToken) -> bool:
+        """Record a token; False if it was already used on this worker"""
+        with self._lock:
+            if token.nonce in self._seen:
+                return False
+            self._seen[token.nonce] = True
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._seen)
+
+
+replay_cache = ReplayCache()
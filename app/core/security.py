@@ -1,17 +1,126 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from app.core.config import JWT_SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.config import (
+    JWT_SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_TIMEOUT_SECONDS,
+)
+
+# Stored for accounts that sign in through Google only. It is not a valid
+# bcrypt hash, so no password ever verifies against it.
+UNUSABLE_PASSWORD = "!oauth-only"
 
 # Password Hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def _crypt_context(rounds: int) -> CryptContext:
+    # min == max == default: hashes at any other cost are flagged for rehash on login
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+pwd_context = _crypt_context(BCRYPT_ROUNDS)
+
+# These run inside the worker processes, so they must be module-level and picklable
+def _hash_in_worker(password: str, rounds: int) -> str:
+    return _crypt_context(rounds).hash(password)
+
+def _verify_in_worker(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    context = _crypt_context(rounds)
+    if not hashed_password or context.identify(hashed_password) is None:
+        return False, None
+    return context.verify_and_update(password, hashed_password)
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small dedicated process pool so login storms cannot
+    starve the request threadpool. At most `max_pending` operations may be
+    queued or running; beyond that callers get an immediate 503. A slot is
+    freed when its operation finishes, not when the caller gives up waiting,
+    so the bound also covers hashes still running after a timeout.
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        rounds: int = BCRYPT_ROUNDS,
+        timeout: float = PASSWORD_HASH_TIMEOUT_SECONDS,
+    ):
+        self.workers = workers
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in requests right now. Please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Frees the slot now if the operation has not started yet
+            future.cancel()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Sign-in is taking longer than usual. Please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash_in_worker, password, self.rounds)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return self._run(_verify_in_worker, password, hashed_password, self.rounds)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+password_hasher = PasswordHasher()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify_and_update(plain_password, hashed_password)[0]
+
+def verify_password_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also returns a new hash when the stored one uses an outdated cost"""
+    return password_hasher.verify_and_update(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 # JWT Token Creation
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -22,4 +131,4 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
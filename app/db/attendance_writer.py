@@ -0,0 +1,197 @@
+"""
+Buffered, deduplicated attendance writes.
+Each worker remembers who is already marked, per day and event, in memory.
+The set for a (day, event) is seeded from the database the first time it is
+needed, usually when an attendance session opens. A repeat scan is answered
+from memory, and a new mark only appends a row to a buffer. A background
+thread inserts the buffer in one statement every ATTENDANCE_FLUSH_INTERVAL_MS,
+or as soon as ATTENDANCE_FLUSH_BATCH_SIZE rows are waiting.
+
+The unique index on (user_id, event, day) is the final guard: rows that
+another worker already wrote are skipped by ON CONFLICT DO NOTHING. Rows
+still in memory when a process dies are lost, as with the forum like
+buffer; the scanner shows SUCCESS before the row is written.
+"""
+
+import threading
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.config import ATTENDANCE_FLUSH_INTERVAL_MS, ATTENDANCE_FLUSH_BATCH_SIZE
+from app.core.secure_error_handler import SecureErrorHandler
+from app.db.models import AttendanceRecord
+
+Scope = Tuple[date, int]  # (day, event id or 0 for general attendance)
+
+_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+def _scope(event_id: Optional[int], day: Optional[date]) -> Scope:
+    return (day or date.today(), event_id or 0)
+
+
+class AttendanceWriter:
+    def __init__(
+        self,
+        flush_interval: float = ATTENDANCE_FLUSH_INTERVAL_MS / 1000,
+        batch_size: int = ATTENDANCE_FLUSH_BATCH_SIZE,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._marked: Dict[Scope, Set[int]] = {}
+        self._pending: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.duplicates_skipped = 0
+
+    def seed(self, db: Session, event_id: Optional[int], day: Optional[date] = None) -> None:
+        """Load who is already marked for an event (None = general) on a day, unless already known"""
+        scope = _scope(event_id, day)
+        with self._lock:
+            if scope in self._marked:
+                return
+        marked = set(
+            db.exec(
+                select(AttendanceRecord.user_id).where(
+                    AttendanceRecord.day == scope[0],
+                    AttendanceRecord.event_id == event_id,
+                )
+            ).all()
+        )
+        with self._lock:
+            # Forget earlier days; a mark made while we were reading stays
+            for old in [s for s in self._marked if s[0] < scope[0]]:
+                del self._marked[old]
+            self._marked.setdefault(scope, set()).update(marked)
+
+    def is_marked(self, user_id: int, event_id: Optional[int], day: Optional[date] = None) -> bool:
+        with self._lock:
+            return user_id in self._marked.get(_scope(event_id, day), ())
+
+    def mark(self, user_id: int, event_id: Optional[int], notes: Optional[str] = None) -> bool:
+        """
+        Record attendance for today. Returns False, without touching the
+        database, if the user is already marked. The row is written by the
+        next flush.
+        """
+        scope = _scope(event_id, None)
+        with self._lock:
+            needs_seed = scope not in self._marked
+        if needs_seed:
+            # First mark of a new day, or a scope no session has opened
+            with self._session_factory() as db:
+                self.seed(db, event_id, scope[0])
+        with self._lock:
+            marked = self._marked[scope]
+            if user_id in marked:
+                return False
+            marked.add(user_id)
+            self._pending.append(
+                {
+                    "user_id": user_id,
+                    "event_id": event_id,
+                    "day": scope[0],
+                    "timestamp": datetime.utcnow(),
+                    "notes": notes,
+                }
+            )
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+        return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        self._session_factory = session_factory
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+        # Write whatever arrived after the last periodic flush
+        if self._session_factory is not None:
+            self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                SecureErrorHandler.log_error(e, "Attendance flush")
+
+    def flush(self) -> int:
+        """Insert buffered rows; returns the number of new rows written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            try:
+                written = self._insert(rows)
+            except IntegrityError:
+                # A row the unique index does not cover failed, e.g. a user deleted meanwhile: write the rest one by one
+                written = 0
+                for row in rows:
+                    try:
+                        written += self._insert([row])
+                    except IntegrityError as e:
+                        SecureErrorHandler.log_error(e, "Attendance flush (row dropped)", row["user_id"])
+            except Exception:
+                # Put the rows back so the next flush retries them
+                with self._lock:
+                    self._pending[:0] = rows
+                raise
+            self.flushes += 1
+            self.rows_written += written
+            self.duplicates_skipped += len(rows) - written
+            return written
+
+    def _insert(self, rows: List[dict]) -> int:
+        with self._session_factory() as session:
+            connection = session.connection()
+            table = AttendanceRecord.__table__
+            insert = _INSERTS.get(connection.dialect.name)
+            if insert is None:
+                statement = table.insert()
+            else:
+                statement = insert(table).on_conflict_do_nothing()
+            result = connection.execute(statement, rows)
+            session.commit()
+            return result.rowcount if result.rowcount >= 0 else len(rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "scopes": len(self._marked),
+                "marked": sum(len(users) for users in self._marked.values()),
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+                "duplicates_skipped": self.duplicates_skipped,
+            }
+
+
+attendance_writer = AttendanceWriter()
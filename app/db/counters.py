@@ -0,0 +1,188 @@
+"""
+Global counters for the admin dashboard.
+Totals live in the GlobalCounter table and are adjusted in the same
+transaction as the inserts and deletes that change them, via a
+before_flush hook on every Session. The dashboard then reads a handful of
+rows instead of counting whole tables.
+
+Recompute from scratch and report drift:
+    python -m app.db.counters           # report only
+    python -m app.db.counters --fix     # report and overwrite stored values
+"""
+
+import argparse
+from collections import Counter
+from typing import Dict
+
+from sqlalchemy import event, func, inspect, update
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+
+from app.db.models import (
+    Club,
+    Event,
+    EventRegistration,
+    GlobalCounter,
+    Membership,
+    RoleRequest,
+    RoleRequestStatus,
+    User,
+)
+
+USERS = "users"
+CLUBS = "clubs"
+EVENTS = "events"
+MEMBERSHIPS = "memberships"
+REGISTRATIONS = "registrations"
+PENDING_ROLE_REQUESTS = "pending_role_requests"
+
+_COUNTED_MODELS = {
+    User: USERS,
+    Club: CLUBS,
+    Event: EVENTS,
+    Membership: MEMBERSHIPS,
+    EventRegistration: REGISTRATIONS,
+}
+
+# Source-of-truth queries, used to seed and reconcile the stored values
+_RECOUNT_QUERIES = {
+    USERS: select(func.count()).select_from(User),
+    CLUBS: select(func.count()).select_from(Club),
+    EVENTS: select(func.count()).select_from(Event),
+    MEMBERSHIPS: select(func.count()).select_from(Membership),
+    REGISTRATIONS: select(func.count()).select_from(EventRegistration),
+    PENDING_ROLE_REQUESTS: select(func.count()).select_from(RoleRequest).where(
+        RoleRequest.status == RoleRequestStatus.pending
+    ),
+}
+
+COUNTER_NAMES = tuple(_RECOUNT_QUERIES)
+
+
+def _count_links(connection: Connection, column, value) -> int:
+    return connection.execute(select(func.count()).where(column == value)).scalar_one()
+
+
+@event.listens_for(Session, "before_flush")
+def _track_counter_deltas(session: Session, flush_context, instances) -> None:
+    deltas: Counter = Counter()
+
+    for obj in session.new:
+        name = _COUNTED_MODELS.get(type(obj))
+        if name:
+            deltas[name] += 1
+        if isinstance(obj, RoleRequest) and obj.status == RoleRequestStatus.pending:
+            deltas[PENDING_ROLE_REQUESTS] += 1
+
+    if session.deleted:
+        connection = session.connection()
+        for obj in session.deleted:
+            name = _COUNTED_MODELS.get(type(obj))
+            if name:
+                deltas[name] -= 1
+            # Many-to-many link rows are removed by the ORM without passing through
+            # session.deleted, so count them before the flush deletes them.
+            if isinstance(obj, User):
+                deltas[MEMBERSHIPS] -= _count_links(connection, Membership.user_id, obj.id)
+                deltas[REGISTRATIONS] -= _count_links(connection, EventRegistration.user_id, obj.id)
+            elif isinstance(obj, Club):
+                deltas[MEMBERSHIPS] -= _count_links(connection, Membership.club_id, obj.id)
+            elif isinstance(obj, Event):
+                deltas[REGISTRATIONS] -= _count_links(connection, EventRegistration.event_id, obj.id)
+            elif isinstance(obj, RoleRequest):
+                # Compare the loaded value: a pending request may be edited and deleted in one flush
+                history = inspect(obj).attrs.status.history
+                original = history.deleted[0] if history.deleted else obj.status
+                if original == RoleRequestStatus.pending:
+                    deltas[PENDING_ROLE_REQUESTS] -= 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, RoleRequest):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.has_changes():
+            continue
+        was_pending = bool(history.deleted) and history.deleted[0] == RoleRequestStatus.pending
+        is_pending = obj.status == RoleRequestStatus.pending
+        if was_pending != is_pending:
+            deltas[PENDING_ROLE_REQUESTS] += 1 if is_pending else -1
+
+    if not any(deltas.values()):
+        return
+    connection = session.connection()
+    for name, delta in deltas.items():
+        if delta:
+            connection.execute(
+                update(GlobalCounter)
+                .where(GlobalCounter.name == name)
+                .values(value=GlobalCounter.value + delta)
+            )
+
+
+def read_counters(db: Session) -> Dict[str, int]:
+    values = dict(db.exec(select(GlobalCounter.name, GlobalCounter.value)).all())
+    return {name: values.get(name, 0) for name in COUNTER_NAMES}
+
+
+def recount(db: Session) -> Dict[str, int]:
+    return {name: db.exec(query).one() for name, query in _RECOUNT_QUERIES.items()}
+
+
+def reconcile(db: Session, fix: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Compare stored counters with a full recount.
+    Returns {name: {"stored", "actual", "drift"}}; with fix=True the stored
+    values are overwritten (and missing rows created) in one transaction.
+    """
+    stored = dict(db.exec(select(GlobalCounter.name, GlobalCounter.value)).all())
+    actual = recount(db)
+    report = {
+        name: {"stored": stored.get(name, 0), "actual": value, "drift": stored.get(name, 0) - value}
+        for name, value in actual.items()
+    }
+    if fix:
+        for name, value in actual.items():
+            counter = db.get(GlobalCounter, name)
+            if counter is None:
+                counter = GlobalCounter(name=name)
+            counter.value = value
+            db.add(counter)
+        db.commit()
+    return report
+
+
+def ensure_counters(db: Session) -> None:
+    """Seed any missing counter rows from a full recount (first start or new counter)"""
+    existing = set(db.exec(select(GlobalCounter.name)).all())
+    missing = [name for name in COUNTER_NAMES if name not in existing]
+    if not missing:
+        return
+    for name in missing:
+        db.add(GlobalCounter(name=name, value=db.exec(_RECOUNT_QUERIES[name]).one()))
+    db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recompute dashboard counters and report drift")
+    parser.add_argument("--fix", action="store_true", help="Overwrite stored counters with the recomputed values")
+    args = parser.parse_args()
+
+    from app.db.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    with Session(engine) as db:
+        report = reconcile(db, fix=args.fix)
+
+    drifted = 0
+    for name, row in report.items():
+        marker = "" if row["drift"] == 0 else "  <-- drift"
+        drifted += row["drift"] != 0
+        print(f"{name:<24} stored={row['stored']:<10} actual={row['actual']:<10} drift={row['drift']:+d}{marker}")
+    if drifted and not args.fix:
+        print(f"{drifted} counter(s) drifted; rerun with --fix to correct them.")
+    elif drifted:
+        print(f"{drifted} counter(s) corrected.")
+
+
+if __name__ == "__main__":
+    main()
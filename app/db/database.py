@@ -1,14 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool
+from fastapi import Request
 from sqlmodel import SQLModel, Session, create_engine
-from app.core.config import DATABASE_URL
-import os
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import (
+    DATABASE_URL,
+    DATABASE_REPLICA_URL,
+    READ_YOUR_WRITES_SECONDS,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    SQL_ECHO,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE,
+    SQLITE_WRITE_QUEUE,
+)
+from app.db import counters  # registers the counter-maintenance flush hook
+from app.db import forum_search
+from app.db import migrations
+from app.db.sqlite_writer import SQLiteWriter, use_immediate_transactions
+
+def _is_sqlite_file(url_obj) -> bool:
+    return url_obj.get_backend_name() == "sqlite" and url_obj.database not in (None, "", ":memory:")
+
+def apply_sqlite_pragmas(db_engine: Engine) -> None:
+    """WAL lets readers run alongside the single writer; the rest trade durability on power loss for throughput"""
+
+    @event.listens_for(db_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.close()
+
+def _engine_options(url_obj, overrides: dict) -> dict:
+    options = {"echo": SQL_ECHO}
+    if url_obj.get_backend_name() == "sqlite":
+        # FastAPI runs sync routes on a threadpool, so connections cross threads
+        options["connect_args"] = {"check_same_thread": False}
+        if not _is_sqlite_file(url_obj):
+            # In-memory databases use a single shared connection, not a QueuePool
+            options.update(overrides)
+            return options
+
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    options.update(overrides)
+    return options
+
+def create_db_engine(url: str = DATABASE_URL, **overrides) -> Engine:
+    """
+    Build an engine for SQLite (development) or PostgreSQL (production).
+    Pool settings come from config and can be overridden per call.
+    """
+    url_obj = make_url(url)
+    db_engine = create_engine(url_obj, **_engine_options(url_obj, overrides))
+    if _is_sqlite_file(url_obj):
+        apply_sqlite_pragmas(db_engine)
+    return db_engine
+
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def create_async_db_engine(url: str = DATABASE_URL, **overrides) -> AsyncEngine:
+    """Async counterpart of create_db_engine (aiosqlite / asyncpg) for async def routes"""
+    url_obj = make_url(url)
+    backend = url_obj.get_backend_name()
+    if backend in _ASYNC_DRIVERS:
+        url_obj = url_obj.set(drivername=_ASYNC_DRIVERS[backend])
+    db_engine = create_async_engine(url_obj, **_engine_options(url_obj, overrides))
+    if _is_sqlite_file(url_obj):
+        apply_sqlite_pragmas(db_engine.sync_engine)
+    return db_engine
+
+def create_sqlite_writer(url: str = DATABASE_URL) -> Optional[SQLiteWriter]:
+    """A dedicated one-connection engine and writer thread, for SQLite files only"""
+    if not _is_sqlite_file(make_url(url)):
+        return None
+    writer_engine = create_db_engine(url, pool_size=1, max_overflow=0)
+    use_immediate_transactions(writer_engine)
+    return SQLiteWriter(writer_engine)
+
+engine = create_db_engine()
+replica_engine = create_db_engine(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+async_engine = create_async_db_engine()
+async_replica_engine = create_async_db_engine(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+sqlite_writer = create_sqlite_writer() if SQLITE_WRITE_QUEUE else None
+
+class RecentWriters:
+    """
+    Bounded LRU of clients that wrote within the last `window` seconds.
+    Per process: with several workers a client may briefly hit the replica
+    from a worker that did not see its write.
+    """
 
-# Configure engine based on database type
-if DATABASE_URL.startswith("sqlite"):
-    # SQLite configuration
-    engine = create_engine(DATABASE_URL, echo=True, connect_args={"check_same_thread": False})
-else:
-    # PostgreSQL configuration (for production)
-    engine = create_engine(DATABASE_URL, echo=True)
+    def __init__(self, window: float = READ_YOUR_WRITES_SECONDS, max_entries: int = 10000):
+        self.window = window
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, key: str) -> None:
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.window
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def is_recent(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+
+recent_writers = RecentWriters()
+
+def client_key(request: Request) -> Optional[str]:
+    """Identify a client for read-your-writes stickiness by its bearer token"""
+    return request.headers.get("authorization")
+
+def run_write(db: Session, fn: Callable[[Session], Any]) -> Any:
+    """
+    Run a write unit and commit it.
+    On SQLite it goes through the single-writer queue (group commit); on
+    other databases it runs on the request's own session. `fn` receives the
+    session to use and its return value is passed back.
+    """
+    if sqlite_writer is not None:
+        return sqlite_writer.run(fn)
+    result = fn(db)
+    db.commit()
+    return result
+
+def get_pool_stats(db_engine: Engine = engine) -> dict:
+    """Snapshot of connection pool usage for monitoring"""
+    pool = db_engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=pool._max_overflow,
+        )
+    if sqlite_writer is not None and db_engine is engine:
+        stats["sqlite_writer"] = {"commits": sqlite_writer.commits, "jobs": sqlite_writer.jobs}
+    return stats
 
 def create_db_and_tables():
     # --- FIX ---
@@ -16,9 +175,45 @@ def create_db_and_tables():
     # registered with SQLModel's metadata before we try to create the tables.
     from app.db import models
     # -----------
-    
+
     SQLModel.metadata.create_all(engine)
+    migrations.apply_migrations(engine)
+    forum_search.ensure_search_index(engine)
+    with Session(engine) as session:
+        counters.ensure_counters(session)
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+def _use_primary_for_reads(request: Request) -> bool:
+    key = client_key(request)
+    return bool(key) and recent_writers.is_recent(key)
+
+def get_read_session(request: Request):
+    """
+    Session for read-only routes: the replica when one is configured,
+    unless this client wrote recently and must read its own writes.
+    """
+    read_engine = replica_engine
+    if read_engine is None or _use_primary_for_reads(request):
+        read_engine = engine
+    with Session(read_engine) as session:
+        yield session
+
+async def get_async_session():
+    """
+    AsyncSession for async def routes, so queries await on the event loop
+    instead of blocking it. Objects stay loaded after commit because lazy
+    loads are not available in async code.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_async_read_session(request: Request):
+    """Async counterpart of get_read_session"""
+    read_engine = async_replica_engine
+    if read_engine is None or _use_primary_for_reads(request):
+        read_engine = async_engine
+    async with AsyncSession(read_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,106 @@
+"""
+Stored "hot" score for the forum feed.
+hot_score = (likes + 2 * replies + 1) / (age_hours + 2) ** GRAVITY
+
+The score lives in an indexed column so GET /forums/posts?sort=hot is an
+index scan. It is recomputed for a post whenever its replies or likes
+change, and a periodic sweep applies time decay to recent posts. Posts
+older than FORUM_HOT_WINDOW_DAYS drop to zero and are left alone.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import bindparam, update
+from sqlmodel import Session, select
+
+from app.core.config import FORUM_HOT_SWEEP_INTERVAL_SECONDS, FORUM_HOT_WINDOW_DAYS
+from app.core.secure_error_handler import SecureErrorHandler
+from app.db.models import ForumPost
+
+GRAVITY = 1.5
+REPLY_WEIGHT = 2
+_SWEEP_BATCH_SIZE = 1000
+
+
+def hot_score(likes: int, replies: int, created_at: datetime, now: Optional[datetime] = None) -> float:
+    now = now or datetime.utcnow()
+    if created_at < now - timedelta(days=FORUM_HOT_WINDOW_DAYS):
+        return 0.0
+    age_hours = max((now - created_at).total_seconds() / 3600, 0.0)
+    return (max(likes, 0) + REPLY_WEIGHT * replies + 1) / (age_hours + 2) ** GRAVITY
+
+
+def refresh_hot_scores(session: Session, post_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute hot_score for the given posts, or for every post inside the hot
+    window when post_ids is None. Runs in the caller's transaction.
+    """
+    now = datetime.utcnow()
+    table = ForumPost.__table__
+    statement = select(ForumPost.id, ForumPost.likes_count, ForumPost.replies_count, ForumPost.created_at)
+    if post_ids is not None:
+        statement = statement.where(ForumPost.id.in_(list(post_ids)))
+    else:
+        cutoff = now - timedelta(days=FORUM_HOT_WINDOW_DAYS)
+        statement = statement.where(ForumPost.created_at >= cutoff)
+        # Posts that just left the window get their final score of zero
+        session.connection().execute(
+            update(table).where(table.c.created_at < cutoff, table.c.hot_score > 0).values(hot_score=0.0)
+        )
+
+    rows = session.exec(statement.order_by(ForumPost.id)).all()
+    update_scores = update(table).where(table.c.id == bindparam("post_id")).values(hot_score=bindparam("score"))
+    for start in range(0, len(rows), _SWEEP_BATCH_SIZE):
+        batch = rows[start:start + _SWEEP_BATCH_SIZE]
+        session.connection().execute(
+            update_scores,
+            [
+                {"post_id": post_id, "score": hot_score(likes, replies, created_at, now)}
+                for post_id, likes, replies, created_at in batch
+            ],
+        )
+    return len(rows)
+
+
+class HotScoreSweeper:
+    """Background thread that re-applies time decay to recent posts"""
+
+    def __init__(self, interval: float = FORUM_HOT_SWEEP_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self.sweeps = 0
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._session_factory = session_factory
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="forum-hot-sweep", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def sweep(self) -> int:
+        with self._session_factory() as session:
+            refreshed = refresh_hot_scores(session)
+            session.commit()
+        self.sweeps += 1
+        return refreshed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                SecureErrorHandler.log_error(e, "Forum hot score sweep")
+
+
+hot_score_sweeper = HotScoreSweeper()
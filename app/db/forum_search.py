@@ -0,0 +1,214 @@
+"""
+Full-text search over forum posts and replies.
+SQLite uses an FTS5 table kept in sync by triggers on forumpost and
+forumreply; PostgreSQL uses generated tsvector columns with GIN indexes.
+Either way the index is maintained by the database itself, in the same
+transaction as the insert, update or delete that changes a post or reply.
+"""
+
+import html
+import re
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# Match markers are control characters so the surrounding text can be
+# HTML-escaped before they are turned into <mark> tags.
+_MARK_START = "\x02"
+_MARK_STOP = "\x03"
+_SNIPPET_TOKENS = 16
+
+# FTS5 rowids: posts use 2 * id, replies 2 * id + 1, so both fit in one table
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE forum_search USING fts5(
+        title, content, post_id UNINDEXED, reply_id UNINDEXED,
+        tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    INSERT INTO forum_search (rowid, title, content, post_id, reply_id)
+    SELECT id * 2, title, content, id, NULL FROM forumpost
+    """,
+    """
+    INSERT INTO forum_search (rowid, title, content, post_id, reply_id)
+    SELECT id * 2 + 1, '', content, post_id, id FROM forumreply
+    """,
+]
+
+_SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS forumpost_search_insert AFTER INSERT ON forumpost BEGIN
+        INSERT INTO forum_search (rowid, title, content, post_id, reply_id)
+        VALUES (new.id * 2, new.title, new.content, new.id, NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS forumpost_search_update AFTER UPDATE OF title, content ON forumpost BEGIN
+        DELETE FROM forum_search WHERE rowid = old.id * 2;
+        INSERT INTO forum_search (rowid, title, content, post_id, reply_id)
+        VALUES (new.id * 2, new.title, new.content, new.id, NULL);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS forumpost_search_delete AFTER DELETE ON forumpost BEGIN
+        DELETE FROM forum_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS forumreply_search_insert AFTER INSERT ON forumreply BEGIN
+        INSERT INTO forum_search (rowid, title, content, post_id, reply_id)
+        VALUES (new.id * 2 + 1, '', new.content, new.post_id, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS forumreply_search_update AFTER UPDATE OF content ON forumreply BEGIN
+        DELETE FROM forum_search WHERE rowid = old.id * 2 + 1;
+        INSERT INTO forum_search (rowid, title, content, post_id, reply_id)
+        VALUES (new.id * 2 + 1, '', new.content, new.post_id, new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS forumreply_search_delete AFTER DELETE ON forumreply BEGIN
+        DELETE FROM forum_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+_POSTGRES_DDL = [
+    """
+    ALTER TABLE forumpost ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_forumpost_search ON forumpost USING GIN (search_vector)",
+    """
+    ALTER TABLE forumreply ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_forumreply_search ON forumreply USING GIN (search_vector)",
+]
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """Create the search index (and backfill it on first run) for the engine's dialect"""
+    dialect = engine.dialect.name
+    with engine.begin() as connection:
+        if dialect == "sqlite":
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'forum_search'"
+            ).first()
+            if not exists:
+                for statement in _SQLITE_DDL:
+                    connection.exec_driver_sql(statement)
+            for statement in _SQLITE_TRIGGERS:
+                connection.exec_driver_sql(statement)
+        elif dialect == "postgresql":
+            for statement in _POSTGRES_DDL:
+                connection.exec_driver_sql(statement)
+
+
+def _filters(club_id: Optional[int], event_id: Optional[int], category: Optional[str]) -> str:
+    clauses = []
+    if club_id is not None:
+        clauses.append("AND p.club_id = :club_id")
+    if event_id is not None:
+        clauses.append("AND p.event_id = :event_id")
+    if category is not None:
+        clauses.append("AND p.category = :category")
+    return " ".join(clauses)
+
+
+def _sqlite_statement(filters: str):
+    # bm25() is lower-is-better; negate it so every dialect returns higher-is-better scores
+    return text(f"""
+        SELECT forum_search.post_id AS post_id,
+               forum_search.reply_id AS reply_id,
+               p.title AS title,
+               snippet(forum_search, 1, :mark_start, :mark_stop, '…', {_SNIPPET_TOKENS}) AS snippet,
+               -bm25(forum_search, 10.0, 1.0) AS score,
+               p.club_id AS club_id,
+               p.event_id AS event_id,
+               p.category AS category,
+               coalesce(r.created_at, p.created_at) AS created_at
+        FROM forum_search
+        JOIN forumpost p ON p.id = forum_search.post_id
+        LEFT JOIN forumreply r ON r.id = forum_search.reply_id
+        WHERE forum_search MATCH :query {filters}
+        ORDER BY bm25(forum_search, 10.0, 1.0)
+        LIMIT :limit OFFSET :offset
+    """)
+
+
+def _postgres_statement(filters: str):
+    # ts_headline is costly, so it only runs on the page of hits that is returned
+    return text(f"""
+        WITH q AS (SELECT plainto_tsquery('english', :query) AS tsq),
+        hits AS (
+            SELECT p.id AS post_id, NULL::integer AS reply_id, p.content AS content,
+                   ts_rank(p.search_vector, q.tsq) AS score, p.created_at AS created_at
+            FROM forumpost p, q
+            WHERE p.search_vector @@ q.tsq {filters}
+            UNION ALL
+            SELECT r.post_id, r.id, r.content,
+                   ts_rank(r.search_vector, q.tsq), r.created_at
+            FROM forumreply r JOIN forumpost p ON p.id = r.post_id, q
+            WHERE r.search_vector @@ q.tsq {filters}
+            ORDER BY score DESC
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT hits.post_id, hits.reply_id, p.title,
+               ts_headline('english', hits.content, q.tsq, :headline_options) AS snippet,
+               hits.score, p.club_id, p.event_id, p.category, hits.created_at
+        FROM hits JOIN forumpost p ON p.id = hits.post_id, q
+        ORDER BY hits.score DESC
+    """)
+
+
+def _highlight(snippet: Optional[str]) -> str:
+    escaped = html.escape(snippet or "")
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_STOP, "</mark>")
+
+
+async def search_forums(
+    db: AsyncSession,
+    query: str,
+    club_id: Optional[int] = None,
+    event_id: Optional[int] = None,
+    category: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[dict]:
+    """
+    Ranked post and reply matches for `query`, best first. Each hit carries
+    its post's title and filters, and an HTML-escaped snippet with matches
+    wrapped in <mark>.
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return []
+
+    params = {"limit": limit, "offset": offset}
+    for name, value in (("club_id", club_id), ("event_id", event_id), ("category", category)):
+        if value is not None:
+            params[name] = value
+    filters = _filters(club_id, event_id, category)
+    if db.bind.dialect.name == "postgresql":
+        statement = _postgres_statement(filters)
+        params["query"] = " ".join(terms)
+        params["headline_options"] = (
+            f"StartSel={_MARK_START}, StopSel={_MARK_STOP}, MaxWords={_SNIPPET_TOKENS}, MinWords=5"
+        )
+    else:
+        statement = _sqlite_statement(filters)
+        # Quote every term so user input can never be parsed as FTS5 query syntax
+        params["query"] = " ".join(f'"{term}"' for term in terms)
+        params["mark_start"] = _MARK_START
+        params["mark_stop"] = _MARK_STOP
+
+    rows = (await db.execute(statement, params)).mappings().all()
+    return [{**row, "snippet": _highlight(row["snippet"])} for row in rows]
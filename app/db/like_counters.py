@@ -0,0 +1,151 @@
+"""
+Write-behind buffer for forum like counts.
+Like and unlike requests only insert or delete their (target, user) row and
+record a +1/-1 delta here. A background thread folds the deltas into
+likes_count every FORUM_LIKE_FLUSH_INTERVAL_MS, one UPDATE per changed post
+or reply, so a burst of likes on a popular post becomes a single row write.
+The same transaction refreshes the hot score of each changed post.
+Responses add the still-buffered delta, so a user sees their own like
+immediately.
+
+Deltas still in memory when a process dies are lost; recompute the stored
+counts from the like tables with:
+    python -m app.db.like_counters
+"""
+
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Tuple, Type
+
+from sqlalchemy import bindparam, func, select, update
+from sqlmodel import Session, SQLModel
+
+from app.core.config import FORUM_LIKE_FLUSH_INTERVAL_MS
+from app.core.secure_error_handler import SecureErrorHandler
+from app.db.forum_ranking import refresh_hot_scores
+from app.db.models import ForumLike, ForumPost, ForumReply, ForumReplyLike
+
+Key = Tuple[Type[SQLModel], int]
+
+# Counted model -> (like table, foreign key column pointing at the counted row)
+_LIKE_TABLES = {
+    ForumPost: (ForumLike, ForumLike.post_id),
+    ForumReply: (ForumReplyLike, ForumReplyLike.reply_id),
+}
+
+
+class LikeCounterBuffer:
+    def __init__(self, flush_interval: float = FORUM_LIKE_FLUSH_INTERVAL_MS / 1000):
+        self.flush_interval = flush_interval
+        self._deltas: Dict[Key, int] = defaultdict(int)
+        # Deltas taken by a flush that has not committed yet; still reported by pending()
+        self._inflight: Dict[Key, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.rows_updated = 0
+
+    def add(self, model: Type[SQLModel], row_id: int, delta: int) -> None:
+        if delta:
+            with self._lock:
+                self._deltas[(model, row_id)] += delta
+
+    def pending(self, model: Type[SQLModel], row_id: int) -> int:
+        """Delta recorded for a row but not yet written to its likes_count"""
+        key = (model, row_id)
+        with self._lock:
+            return self._deltas.get(key, 0) + self._inflight.get(key, 0)
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._session_factory = session_factory
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="like-counter-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+        # Write whatever arrived after the last periodic flush
+        if self._session_factory is not None:
+            self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                SecureErrorHandler.log_error(e, "Forum like counter flush")
+
+    def flush(self) -> int:
+        """Write buffered deltas; returns the number of rows updated"""
+        with self._flush_lock:
+            with self._lock:
+                taken = {key: delta for key, delta in self._deltas.items() if delta}
+                self._deltas.clear()
+                self._inflight = taken
+            if not taken:
+                return 0
+
+            by_model: Dict[Type[SQLModel], list] = defaultdict(list)
+            # Sorted ids give concurrent workers a consistent lock order on PostgreSQL
+            for (model, row_id), delta in sorted(taken.items(), key=lambda item: (item[0][0].__name__, item[0][1])):
+                by_model[model].append({"row_id": row_id, "delta": delta})
+            try:
+                with self._session_factory() as session:
+                    connection = session.connection()
+                    for model, params in by_model.items():
+                        table = model.__table__
+                        connection.execute(
+                            update(table)
+                            .where(table.c.id == bindparam("row_id"))
+                            .values(likes_count=table.c.likes_count + bindparam("delta")),
+                            params,
+                        )
+                    if ForumPost in by_model:
+                        refresh_hot_scores(session, [param["row_id"] for param in by_model[ForumPost]])
+                    session.commit()
+            except Exception:
+                # Put the deltas back so the next flush retries them
+                with self._lock:
+                    for key, delta in taken.items():
+                        self._deltas[key] += delta
+                    self._inflight = {}
+                raise
+
+            with self._lock:
+                self._inflight = {}
+            self.flushes += 1
+            self.rows_updated += len(taken)
+            return len(taken)
+
+
+like_counter_buffer = LikeCounterBuffer()
+
+
+def recount_likes(db: Session) -> None:
+    """Overwrite every stored likes_count with a count of its like rows"""
+    for model, (like_model, column) in _LIKE_TABLES.items():
+        count = select(func.count()).select_from(like_model).where(column == model.id).scalar_subquery()
+        db.exec(update(model).values(likes_count=count))
+    refresh_hot_scores(db)
+    db.commit()
+
+
+def main() -> None:
+    from app.db.database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    with Session(engine) as db:
+        recount_likes(db)
+    print("Forum like counts recomputed.")
+
+
+if __name__ == "__main__":
+    main()
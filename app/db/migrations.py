@@ -0,0 +1,128 @@
+"""
+Schema and data migrations for databases created before a model change.
+create_all() only creates missing tables, so columns added to existing
+tables are added here. Every migration is idempotent and runs on startup
+from create_db_and_tables(); run them by hand with:
+    python -m app.db.migrations [--drop-legacy-face-encodings]
+"""
+
+import argparse
+
+from sqlalchemy import delete, func, inspect, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+
+from app.core.secure_error_handler import SecureErrorHandler
+from app.db.models import AttendanceRecord, User
+
+_BATCH_SIZE = 500
+
+
+def _add_column_if_missing(engine: Engine, table: str, column: str, ddl_type: str) -> bool:
+    columns = {info["name"] for info in inspect(engine).get_columns(table)}
+    if column in columns:
+        return False
+    # "user" is a reserved word in PostgreSQL, so names are quoted by the dialect
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"ALTER TABLE {quote(table)} ADD COLUMN {quote(column)} {ddl_type}")
+    return True
+
+
+def migrate_face_encodings(engine: Engine, drop_legacy: bool = False) -> int:
+    """
+    Add user.face_embedding and fill it from the legacy comma-joined
+    face_encoding strings. Returns the number of users converted. With
+    drop_legacy the converted strings are cleared to reclaim their space.
+    Malformed strings are logged and left as they are.
+    """
+    from app.ai.face_encodings import encoding_to_bytes, string_to_encoding
+
+    blob_type = "BYTEA" if engine.dialect.name == "postgresql" else "BLOB"
+    _add_column_if_missing(engine, "user", "face_embedding", blob_type)
+
+    table = User.__table__
+    converted = 0
+    last_id = 0
+    with engine.begin() as connection:
+        while True:
+            # Paged by id so rows skipped below are not selected again
+            rows = connection.execute(
+                select(table.c.id, table.c.face_encoding)
+                .where(
+                    table.c.id > last_id,
+                    table.c.face_embedding.is_(None),
+                    table.c.face_encoding.is_not(None),
+                )
+                .order_by(table.c.id)
+                .limit(_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            for user_id, encoding_str in rows:
+                try:
+                    blob = encoding_to_bytes(string_to_encoding(encoding_str))
+                except ValueError as e:
+                    SecureErrorHandler.log_error(e, "Face encoding migration (row skipped)", user_id)
+                    continue
+                connection.execute(update(table).where(table.c.id == user_id).values(face_embedding=blob))
+                converted += 1
+            last_id = rows[-1][0]
+        if drop_legacy:
+            connection.execute(
+                update(table)
+                .where(table.c.face_embedding.is_not(None), table.c.face_encoding.is_not(None))
+                .values(face_encoding=None)
+            )
+    return converted
+
+
+def migrate_attendance_days(engine: Engine) -> int:
+    """
+    Add attendancerecord.day, fill it from the timestamp and create the
+    one-record-per-user-event-day index. Same-day duplicates left by older
+    versions are deleted first, keeping the earliest. Returns the number of
+    rows deleted.
+    """
+    table = AttendanceRecord.__table__
+    deleted = 0
+    if _add_column_if_missing(engine, "attendancerecord", "day", "DATE"):
+        with engine.begin() as connection:
+            connection.execute(update(table).values(day=func.date(table.c.timestamp)))
+            keep = (
+                select(func.min(table.c.id))
+                .group_by(table.c.user_id, func.coalesce(table.c.event_id, 0), table.c.day)
+                .scalar_subquery()
+            )
+            deleted = connection.execute(delete(table).where(table.c.id.notin_(keep))).rowcount
+    with engine.begin() as connection:
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+    return deleted
+
+
+def apply_migrations(engine: Engine, drop_legacy_face_encodings: bool = False) -> None:
+    migrate_face_encodings(engine, drop_legacy=drop_legacy_face_encodings)
+    migrate_attendance_days(engine)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply pending schema and data migrations")
+    parser.add_argument(
+        "--drop-legacy-face-encodings",
+        action="store_true",
+        help="Clear the old text face encodings once they have been converted",
+    )
+    args = parser.parse_args()
+
+    from app.db.database import engine, SQLModel
+
+    SQLModel.metadata.create_all(engine)
+    converted = migrate_face_encodings(engine, drop_legacy=args.drop_legacy_face_encodings)
+    print(f"Converted {converted} face encoding(s) to binary.")
+    deleted = migrate_attendance_days(engine)
+    print(f"Removed {deleted} duplicate attendance record(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 from typing import List, Optional
 from enum import Enum
+from sqlalchemy import Index, LargeBinary, text
 from sqlmodel import Field, Relationship, SQLModel
-from datetime import datetime
+from datetime import date, datetime
 
 # --- Enums and Link Models ---
 
@@ -29,7 +30,10 @@ class User(SQLModel, table=True):
     full_name: str
     hashed_password: str
     role: UserRole = Field(default=UserRole.student)
+    # Legacy comma-joined text encoding; converted to face_embedding by app.db.migrations
     face_encoding: Optional[str] = Field(default=None, max_length=4096)
+    # 128 little-endian float32 values (512 bytes), see app.ai.face_encodings
+    face_embedding: Optional[bytes] = Field(default=None, sa_type=LargeBinary)
     whatsapp_number: Optional[str] = Field(default=None, index=True)
     whatsapp_verified: bool = Field(default=False)
     whatsapp_consent: bool = Field(default=False)
@@ -109,6 +113,18 @@ class Event(SQLModel, table=True):
     attendees: List[User] = Relationship(back_populates="events_attending", link_model=EventRegistration)
     photos: List["EventPhoto"] = Relationship(back_populates="event") 
 
+class EventNeighbor(SQLModel, table=True):
+    """Precomputed "users of this event/club also attended event_id" scores (see app/ai/collaborative.py)"""
+    source_type: str = Field(primary_key=True, max_length=8)  # "event" or "club"
+    source_id: int = Field(primary_key=True)
+    event_id: int = Field(foreign_key="event.id", primary_key=True)
+    score: float
+
+class EventTrend(SQLModel, table=True):
+    """Time-decayed registration score in forward-decay form (see app/ai/trending.py)"""
+    event_id: int = Field(foreign_key="event.id", primary_key=True)
+    log_score: float = Field(index=True)
+
 class Announcement(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
@@ -126,8 +142,14 @@ class EventPhoto(SQLModel, table=True):
     event: Event = Relationship(back_populates="photos")
 
 class AttendanceRecord(SQLModel, table=True):
+    __table_args__ = (
+        # One record per user per event per day; general attendance (no event) counts as event 0
+        Index("uq_attendance_user_event_day", "user_id", text("coalesce(event_id, 0)"), "day", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    day: date = Field(default_factory=date.today)
     notes: Optional[str] = Field(default=None)
     user_id: int = Field(foreign_key="user.id")
     event_id: Optional[int] = Field(default=None, foreign_key="event.id")
@@ -165,3 +187,115 @@ class RoleRequest(SQLModel, table=True):
     reviewed_by: Optional["User"] = Relationship(
         sa_relationship_kwargs={'foreign_keys': '[RoleRequest.reviewed_by_id]'}
     )
+
+class NotificationStatus(str, Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    failed = "failed"
+
+class NotificationOutbox(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    channel: str = Field(default="whatsapp")
+    to_number: str
+    body: str
+    announcement_id: Optional[int] = Field(default=None, foreign_key="announcement.id", index=True)
+    status: NotificationStatus = Field(default=NotificationStatus.pending, index=True)
+    attempts: int = Field(default=0)
+    # For pending rows: earliest retry time. For sending rows: lease expiry, after which a crashed claim is retried.
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    claim_token: Optional[str] = Field(default=None, index=True)
+    provider_message_id: Optional[str] = Field(default=None)
+    last_error: Optional[str] = Field(default=None, max_length=1000)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = Field(default=None)
+
+class FaceEnrollmentJobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+class FaceEnrollmentJob(SQLModel, table=True):
+    """Progress of a bulk face enrollment run (see app/ai/face_enrollment.py)"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    source: str = Field(max_length=255)
+    status: FaceEnrollmentJobStatus = Field(default=FaceEnrollmentJobStatus.queued)
+    created_by_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    total_images: int = Field(default=0)
+    processed_images: int = Field(default=0)
+    failed_images: int = Field(default=0)
+    total_users: int = Field(default=0)
+    enrolled_users: int = Field(default=0)
+    error: Optional[str] = Field(default=None, max_length=1000)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+
+class FaceEnrollmentFailure(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: int = Field(foreign_key="faceenrollmentjob.id", index=True)
+    email: Optional[str] = Field(default=None)
+    image: str = Field(max_length=255)
+    reason: str = Field(max_length=255)
+
+class GlobalCounter(SQLModel, table=True):
+    """Row-per-metric totals kept in step with inserts and deletes (see app/db/counters.py)"""
+    name: str = Field(primary_key=True, max_length=64)
+    value: int = Field(default=0)
+
+# --- Forum Models ---
+
+class ForumPost(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_forumpost_club_created", "club_id", "created_at"),
+        Index("ix_forumpost_event_created", "event_id", "created_at"),
+        Index("ix_forumpost_category_created", "category", "created_at"),
+        # Feed orderings for sort=hot and sort=top
+        Index("ix_forumpost_hot", "hot_score", "id"),
+        Index("ix_forumpost_top", "likes_count", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    title: str
+    content: str
+    author_id: int = Field(foreign_key="user.id")
+    club_id: Optional[int] = Field(default=None, foreign_key="club.id")
+    event_id: Optional[int] = Field(default=None, foreign_key="event.id")
+    category: str = Field(default="general", max_length=32)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    # Denormalized counts: replies_count is updated with the reply row, likes_count
+    # by the write-behind buffer in app/db/like_counters.py
+    replies_count: int = Field(default=0)
+    likes_count: int = Field(default=0)
+    # Engagement with time decay, see app/db/forum_ranking.py
+    hot_score: float = Field(default=0.0)
+
+class ForumReply(SQLModel, table=True):
+    __table_args__ = (
+        # Thread order: replies sorted by path come out depth-first
+        Index("ix_forumreply_post_path", "post_id", "path"),
+        # Siblings in thread order, used to page through one level of a subtree
+        Index("ix_forumreply_post_parent_path", "post_id", "parent_id", "path"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    post_id: int = Field(foreign_key="forumpost.id")
+    parent_id: Optional[int] = Field(default=None, foreign_key="forumreply.id")
+    author_id: int = Field(foreign_key="user.id")
+    content: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    likes_count: int = Field(default=0)
+    # Materialized path: the zero-padded ids of every ancestor and then this reply
+    path: str = Field(default="", max_length=255)
+    depth: int = Field(default=0)
+
+class ForumLike(SQLModel, table=True):
+    post_id: int = Field(foreign_key="forumpost.id", primary_key=True)
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ForumReplyLike(SQLModel, table=True):
+    reply_id: int = Field(foreign_key="forumreply.id", primary_key=True)
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
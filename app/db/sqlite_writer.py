@@ -0,0 +1,127 @@
+"""
+Single-writer queue for SQLite.
+SQLite allows one writer at a time; instead of letting request threads race
+for the write lock (and fail with "database is locked"), write units are
+queued to one thread that owns the only write connection and commits them
+in groups. Reads keep using the regular pooled engine in parallel (WAL).
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+WriteJob = Tuple[Callable[[Session], Any], Future]
+
+
+def use_immediate_transactions(db_engine: Engine) -> None:
+    """
+    Take over transaction control from pysqlite so SAVEPOINT works and each
+    transaction takes the write lock up front with BEGIN IMMEDIATE.
+    """
+
+    @event.listens_for(db_engine, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(db_engine, "begin")
+    def _begin_immediate(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+class SQLiteWriter:
+    """
+    Runs submitted write functions on one thread.
+    Jobs that arrive together are committed in one transaction (group
+    commit); each job runs in its own SAVEPOINT so a failing job only
+    rolls back its own changes.
+    """
+
+    def __init__(self, db_engine: Engine, max_batch: int = 64, batch_window: float = 0.002):
+        self.engine = db_engine
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self._queue: "queue.Queue[Optional[WriteJob]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.commits = 0
+        self.jobs = 0
+
+    def submit(self, fn: Callable[[Session], Any]) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def run(self, fn: Callable[[Session], Any]) -> Any:
+        """Submit a write and wait for it to be committed"""
+        return self.submit(fn).result()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> Tuple[List[WriteJob], bool]:
+        batch: List[WriteJob] = []
+        job = self._queue.get()
+        if job is None:
+            return batch, True
+        batch.append(job)
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get(timeout=self.batch_window)
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch: List[WriteJob]) -> None:
+        done: List[Tuple[Future, Any]] = []
+        with Session(self.engine, expire_on_commit=False) as session:
+            try:
+                for fn, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with session.begin_nested():
+                            result = fn(session)
+                            session.flush()
+                        done.append((future, result))
+                    except Exception as e:
+                        future.set_exception(e)
+                session.commit()
+                session.expunge_all()
+            except Exception as e:
+                session.rollback()
+                for future, _ in done:
+                    future.set_exception(e)
+                return
+        self.commits += 1
+        self.jobs += len(done)
+        for future, result in done:
+            future.set_result(result)
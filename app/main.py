@@ -1,15 +1,42 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.db.database import create_db_and_tables
+from sqlmodel import Session
+
+from app.core.notifications import start_dispatcher, stop_dispatcher
+from app.core.security import password_hasher
+from app.db.database import create_db_and_tables, engine, async_engine, sqlite_writer, client_key, recent_writers
+from app.db.like_counters import like_counter_buffer
+from app.db.attendance_writer import attendance_writer
+from app.db.forum_ranking import hot_score_sweeper
+from app.ai.recommendation_cache import recommendation_warmer
+from app.ai.face_index import face_index
+from app.ai.frame_pipeline import frame_processor
 from app.api.routes import users, clubs, events, admin, photos, attendance, verification, analytics, forums, role_requests
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Creating database and tables...")
     create_db_and_tables()
+    start_dispatcher(lambda: Session(engine))
+    like_counter_buffer.start(lambda: Session(engine))
+    attendance_writer.start(lambda: Session(engine))
+    hot_score_sweeper.start(lambda: Session(engine))
+    recommendation_warmer.start(lambda: Session(engine))
+    with Session(engine) as db:
+        face_index.load(db)
     yield
+    stop_dispatcher()
+    recommendation_warmer.stop()
+    hot_score_sweeper.stop()
+    like_counter_buffer.stop()
+    attendance_writer.stop()
+    password_hasher.shutdown()
+    frame_processor.shutdown()
+    if sqlite_writer is not None:
+        sqlite_writer.stop()
+    await async_engine.dispose()
     print("Application shutdown.")
 
 app = FastAPI(
@@ -30,6 +57,16 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+@app.middleware("http")
+async def track_recent_writes(request: Request, call_next):
+    """Pin a client's reads to the primary for a short window after a successful write"""
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        key = client_key(request)
+        if key:
+            recent_writers.mark(key)
+    return response
+
 # Sabhi routers ko yahan include karein
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(clubs.router, prefix="/clubs", tags=["Clubs & Announcements"])
@@ -1,8 +1,15 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Generic, List, Optional, TypeVar
 from datetime import datetime
 from app.db.models import UserRole
 
+T = TypeVar("T")
+
+# --- Pagination Schemas ---
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 # --- User Schemas ---
 class UserPublic(BaseModel):
     id: int
@@ -50,6 +57,13 @@ class AnnouncementPublic(AnnouncementBase):
     timestamp: datetime
     club_id: int
 
+class AnnouncementDeliveryStats(BaseModel):
+    announcement_id: int
+    pending: int = 0
+    sending: int = 0
+    sent: int = 0
+    failed: int = 0
+
 # --- Schemas for Detailed Views ---
 class ClubPublicForUser(BaseModel):
     id: int
@@ -74,6 +88,8 @@ class DashboardStats(BaseModel):
     active_clubs: int
     total_events: int
     pending_clubs: int = 0
+    total_memberships: int = 0
+    total_registrations: int = 0
 
 class ClubAdminView(ClubPublic):
     member_count: int
@@ -0,0 +1,85 @@
+"""
+Build time of the collaborative-filtering neighbour job.
+Fills a temporary SQLite database with synthetic registrations and
+memberships (students favour a few interest groups, so co-attendance has
+structure), then times build_neighbours(): loading, the sparse item-item
+similarity, top-N selection and writing the EventNeighbor table.
+
+Usage:
+    python -m benchmarks.collaborative_build --registrations 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.ai.collaborative import build_neighbours
+from app.db.models import Event, EventRegistration, Membership
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--registrations", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--clubs", type=int, default=200)
+    parser.add_argument("--top-n", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    groups = 50
+    events_by_group = [[] for _ in range(groups)]
+    for event_id in range(1, args.events + 1):
+        events_by_group[event_id % groups].append(event_id)
+    clubs_by_group = [[c for c in range(1, args.clubs + 1) if c % groups == g] for g in range(groups)]
+
+    registrations, memberships = set(), set()
+    user_groups = {user_id: rng.sample(range(groups), 2) for user_id in range(1, args.users + 1)}
+    while len(registrations) < args.registrations:
+        user_id = rng.randint(1, args.users)
+        # 80% of registrations fall inside the user's interest groups
+        group = rng.choice(user_groups[user_id]) if rng.random() < 0.8 else rng.randrange(groups)
+        registrations.add((user_id, rng.choice(events_by_group[group])))
+    for user_id, interests in user_groups.items():
+        for group in interests:
+            if clubs_by_group[group] and rng.random() < 0.5:
+                memberships.add((user_id, rng.choice(clubs_by_group[group])))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        now = datetime.now()
+        with Session(engine) as db:
+            connection = db.connection()
+            connection.execute(insert(Event), [
+                {"id": i, "name": f"Event {i}", "description": "", "location": "", "club_id": 1 + i % args.clubs,
+                 "date": now + timedelta(days=i % 60)}
+                for i in range(1, args.events + 1)
+            ])
+            connection.execute(insert(EventRegistration), [{"user_id": u, "event_id": e} for u, e in registrations])
+            connection.execute(insert(Membership), [{"user_id": u, "club_id": c} for u, c in memberships])
+            db.commit()
+
+        with Session(engine) as db:
+            started = time.perf_counter()
+            stats = build_neighbours(db, top_n=args.top_n)
+            elapsed = time.perf_counter() - started
+
+    print(
+        f"{stats['registrations']} registrations, {stats['memberships']} memberships, "
+        f"{stats['items']} items -> {stats['neighbours']} neighbours"
+    )
+    print(
+        f"load {stats['load_seconds']:.2f}s, similarity + top-{args.top_n} {stats['compute_seconds']:.2f}s, "
+        f"full job incl. write {elapsed:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Latency of the content-based event recommender on a synthetic catalogue.
+Builds the in-memory index from generated events (no database), then times
+rank() for users with a handful of registrations and club memberships.
+
+Usage:
+    python -m benchmarks.recommendations --events 50000 --queries 200
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.ai.recommendations import EventIndex
+
+_TOPICS = [
+    "robotics", "music", "dance", "coding", "hackathon", "debate", "photography", "football",
+    "cricket", "startup", "finance", "poetry", "drama", "chess", "gaming", "ai", "design",
+    "quiz", "yoga", "volunteering", "astronomy", "film", "literature", "cooking", "art",
+]
+_WORDS = [
+    "workshop", "session", "night", "meetup", "competition", "talk", "seminar", "festival",
+    "beginners", "advanced", "team", "campus", "students", "hands", "on", "introduction",
+    "practice", "showcase", "league", "final", "open", "mic", "build", "learn", "guest",
+]
+
+
+def _event(event_id: int, rng: random.Random, now: datetime) -> tuple:
+    topics = rng.sample(_TOPICS, 2)
+    name = f"{topics[0].title()} {rng.choice(_WORDS)}"
+    description = " ".join(rng.choices(_WORDS + topics * 3, k=30))
+    date = now + timedelta(days=rng.randint(-180, 180))
+    return event_id, name, description, rng.randint(1, 200), date
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    now = datetime.now()
+    index = EventIndex()
+
+    started = time.perf_counter()
+    index.add_events(_event(i, rng, now) for i in range(1, args.events + 1))
+    index.rank([], [], 1)  # merges the pending rows into the matrix
+    print(f"indexed {args.events} events in {time.perf_counter() - started:.2f}s")
+
+    timings = []
+    for _ in range(args.queries):
+        registered = rng.sample(range(1, args.events + 1), 5)
+        clubs = rng.sample(range(1, 201), 2)
+        started = time.perf_counter()
+        index.rank(registered, clubs, 5, now=now)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(
+        f"rank(): p50 {timings[len(timings) // 2]:.2f} ms, "
+        f"p95 {timings[int(len(timings) * 0.95)]:.2f} ms, max {timings[-1]:.2f} ms"
+    )
+
+    started = time.perf_counter()
+    index.add_event(args.events + 1, "Robotics build night", "hands on robotics", 1, now + timedelta(days=3))
+    index.rank([1], [], 5, now=now)
+    print(f"add one event + next query: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
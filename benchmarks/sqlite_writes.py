@@ -0,0 +1,95 @@
+"""
+Concurrent write throughput on SQLite, before and after the SQLite profile.
+"before" is a plain engine (rollback journal, synchronous=FULL) with every
+thread committing its own transaction; "after" applies the WAL pragmas and
+sends writes through the single-writer queue with group commit.
+
+Usage:
+    python -m benchmarks.sqlite_writes --threads 16 --writes 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.db.database import create_db_engine, create_sqlite_writer
+from app.db.models import User
+
+
+def _new_user(thread_id: int, i: int) -> User:
+    return User(email=f"bench-{thread_id}-{i}@example.com", full_name="Bench User", hashed_password="x")
+
+
+def run_before(url: str, threads: int, writes: int) -> tuple:
+    engine = create_engine(url, connect_args={"check_same_thread": False}, pool_size=threads, max_overflow=0)
+    SQLModel.metadata.create_all(engine)
+    errors = 0
+
+    def worker(thread_id: int) -> int:
+        failed = 0
+        for i in range(writes):
+            try:
+                with Session(engine) as session:
+                    session.add(_new_user(thread_id, i))
+                    session.commit()
+            except OperationalError:
+                failed += 1
+        return failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        errors = sum(executor.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return elapsed, errors
+
+
+def run_after(url: str, threads: int, writes: int) -> tuple:
+    engine = create_db_engine(url)
+    SQLModel.metadata.create_all(engine)
+    writer = create_sqlite_writer(url)
+    errors = 0
+
+    def worker(thread_id: int) -> int:
+        failed = 0
+        for i in range(writes):
+            try:
+                writer.run(lambda session, user=_new_user(thread_id, i): session.add(user))
+            except OperationalError:
+                failed += 1
+        return failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        errors = sum(executor.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    commits = writer.commits
+    writer.stop()
+    writer.engine.dispose()
+    engine.dispose()
+    return elapsed, errors, commits
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="Writes per thread")
+    args = parser.parse_args()
+    total = args.threads * args.writes
+
+    with tempfile.TemporaryDirectory() as tmp:
+        elapsed, errors = run_before(f"sqlite:///{os.path.join(tmp, 'before.db')}", args.threads, args.writes)
+        print(f"before: {total} writes in {elapsed:.2f}s -> {total / elapsed:.0f} writes/s, {errors} locked errors")
+
+        elapsed, errors, commits = run_after(f"sqlite:///{os.path.join(tmp, 'after.db')}", args.threads, args.writes)
+        print(f"after:  {total} writes in {elapsed:.2f}s -> {total / elapsed:.0f} writes/s, {errors} locked errors, "
+              f"{commits} commits ({total / max(commits, 1):.1f} writes per commit)")
+
+
+if __name__ == "__main__":
+    main()